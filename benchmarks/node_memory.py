@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+memory (tracemalloc) and time of the syntax-tree of a document
+
+usage: python3 benchmarks/node_memory.py path/to/large.md
+"""
+import gc
+import sys
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+
+FILE = sys.argv[1] if len(sys.argv) > 1 else 'README.md'
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "termdocs"))
+# configuration.py (imported by the widgets) parses the command-line. but not the one of this script
+sys.argv = sys.argv[:1]
+
+import markdown_it.tree  # noqa: E402
+from widgets.markdown import parser_backend  # noqa: E402
+from widgets.markdown.nodes import Node  # noqa: E402
+
+
+def measure(label: str, build: t.Callable[[], t.Any]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    duration = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {size / 1024 / 1024:8.1f} MiB {duration:6.2f}s")
+    del result
+
+
+def main():
+    markdown = Path(FILE).read_text(encoding='utf-8')
+    measure("tokens", lambda: parser_backend.parse(markdown))
+    measure("tokens + SyntaxTreeNode", lambda: markdown_it.tree.SyntaxTreeNode(parser_backend.parse(markdown)))
+    measure("Node (tokens dropped)", lambda: Node.from_tokens(parser_backend.parse(markdown)))
+
+
+if __name__ == '__main__':
+    main()
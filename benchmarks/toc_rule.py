@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+time per call of the toc block-rule (which runs at the start of every block) before and after the early rejection
+
+usage: python3 benchmarks/toc_rule.py [path/to/large.md]
+(without a file a list-heavy document is generated)
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+
+FILE = sys.argv[1] if len(sys.argv) > 1 else None
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "termdocs"))
+# configuration.py (imported by the widgets) parses the command-line. but not the one of this script
+sys.argv = sys.argv[:1]
+
+from markdown_it.rules_block import StateBlock  # noqa: E402
+from widgets.markdown import markdown_parser  # noqa: E402
+from widgets.markdown.plugins import _toc_rule  # noqa: E402
+
+
+COMPLEX_TOC_RE = re.compile(r"(?P<style>[-*]|\d+\.) .+\n\{:toc}", re.IGNORECASE)
+
+
+def toc_rule_before(state: StateBlock, startLine: int, endLine: int, silent: bool):
+    r"""
+    the rule before the early rejection (sliced the source of every line)
+    """
+    if state.tShift[startLine] != 0:
+        return False
+
+    pos = state.bMarks[startLine]
+    end = state.eMarks[startLine]
+    content = state.src[pos:end]
+
+    if content.startswith('[[TOC]]'):
+        state.line = startLine + 1
+        token = state.push(ttype="toc", tag="", nesting=0)
+        token.map = [startLine, state.line]
+        token.attrs["style"] = "-"
+        token.markup = '[['
+        return True
+
+    if state.tShift[startLine+1] != 0:
+        return False
+
+    pos = state.bMarks[startLine]
+    maximum = state.eMarks[startLine+1]
+    content = state.src[pos:maximum]
+    match = COMPLEX_TOC_RE.fullmatch(content)
+
+    if match is not None:
+        state.line = startLine + 2
+        token = state.push(ttype="toc", tag="", nesting=0)
+        token.map = [startLine, state.line]
+        token.attrs["style"] = match.group('style')
+        token.markup = '{:'
+        return True
+
+    return False
+
+
+def generated_document(lines: int = 45_000) -> str:
+    parts = []
+    for index in range(lines // 5):
+        parts.append(f"- item {index} with some *text*\n* another item\n{index % 9 + 1}. numbered\n\nA paragraph.\n")
+    return ''.join(parts)
+
+
+def main():
+    markdown = Path(FILE).read_text(encoding='utf-8') if FILE else generated_document()
+    state = StateBlock(markdown, markdown_parser, {}, [])
+    # the last line has no next line (the old rule reads past it)
+    lines = range(state.lineMax - 1)
+    for label, rule in (("before", toc_rule_before), ("after", _toc_rule)):
+        def run():
+            for line in lines:
+                rule(state, line, state.lineMax, True)
+        seconds = min(timeit.repeat(run, number=1, repeat=5))
+        print(f"{label:<8} {seconds * 1e6 / len(lines):6.3f}us per call ({len(lines)} lines)")
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,10 @@ for handler in logging.getLogger().handlers:
 
 CSS_PATHS = ["style.css", *configuration.args.css]
 
+widgets.markdown.TOKEN_CACHE.enabled = configuration.args.cache
+widgets.DetailImage.DITHER = bool(configuration.args.dither)
+widgets.IMAGE_STORE.max_bytes = configuration.args.image_memory * 1024 * 1024
+
 
 class LoggingConsole(textual.widgets.RichLog):
     pass
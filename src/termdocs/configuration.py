@@ -12,6 +12,14 @@ from __version__ import __version__
 class __Namespace:
     all: bool
     css: _t.List[str]
+    cache: bool
+    virtualize: _t.Optional[bool]
+    stream: _t.Optional[bool]
+    dither: bool
+    image_memory: int
+    watch: bool
+    flat: bool
+    line_tables: bool
     docs: str
 
     def __repr__(self):
@@ -31,6 +39,26 @@ __parser.add_argument('--md-css', '--md-style', dest="css", action="append_const
                       help="load default tailwind-like css classes for the markdown attributes\n"
                            "(e.g. p-1, bg-warning, text-right)\n"
                            "(increases load time significantly)")
+__parser.add_argument('--cache', type=bool, action=__argparse.BooleanOptionalAction, default=True,
+                      help="cache parsed documents on disk to speed up later starts")
+__parser.add_argument('--virtualize', type=bool, action=__argparse.BooleanOptionalAction, default=None,
+                      help="only mount the parts of a document that are near the viewport\n"
+                           "(default: only for large documents)")
+__parser.add_argument('--stream', type=bool, action=__argparse.BooleanOptionalAction, default=None,
+                      help="parse and show a document in chunks while it is read\n"
+                           "(default: only for very large files)")
+__parser.add_argument('--dither', type=bool, action=__argparse.BooleanOptionalAction,
+                      help="use ordered dithering for the detailed (braille) images to show shades")
+__parser.add_argument('--image-memory', type=int, default=128, metavar="MiB",
+                      help="memory for the decoded images that are shared by all image-widgets")
+__parser.add_argument('-w', '--watch', type=bool, action=__argparse.BooleanOptionalAction,
+                      help="re-render the changed parts of the opened document when the file changes")
+__parser.add_argument('--flat', type=bool, action=__argparse.BooleanOptionalAction,
+                      help="render pure-text blocks (paragraphs, lists, cites) as single widgets\n"
+                           "(faster and less memory for text-heavy documents)")
+__parser.add_argument('--line-tables', type=bool, action=__argparse.BooleanOptionalAction,
+                      help="render tables (without images) line by line instead of a widget per cell\n"
+                           "(much faster for large tables)")
 __parser.add_argument('docs', nargs='?', default='.',
                       help="folder or file to view")
 __parser.add_argument('-v', '--version', action='version', version=__version__)
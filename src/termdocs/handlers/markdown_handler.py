@@ -10,6 +10,7 @@ import textual.app
 import textual.widgets
 from widgets import Markdown
 from util import Compatibility, HyperRef
+import configuration
 from .basehandler import BaseHandler
 from .register import register_handler
 
@@ -23,7 +24,14 @@ class MarkdownHandler(BaseHandler):
         return Compatibility.NONE
 
     def compose(self) -> textual.app.ComposeResult:
-        yield Markdown(file=self.filepath)
+        yield Markdown(
+            file=self.filepath,
+            virtualize=configuration.args.virtualize,
+            stream=configuration.args.stream,
+            auto_reload=bool(configuration.args.watch),
+            flat=bool(configuration.args.flat),
+            line_tables=bool(configuration.args.line_tables),
+        )
 
     @textual.on(Markdown.LinkClicked)
     def on_markdown_link_clicked(self, event: Markdown.LinkClicked):
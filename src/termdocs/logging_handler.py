@@ -8,14 +8,28 @@ from textual.logging import active_app
 
 
 class InternLoggingHandler(logging.Handler):
+    _app = None
+
     def emit(self, record: logging.LogRecord) -> None:
         """Invoked by logging."""
         message = self.format(record)
         try:
             app = active_app.get()
         except LookupError as exc:
-            print("Failed to lookup app", exc)
+            if self._app is None:
+                print("Failed to lookup app", exc)
+                return
+            # logged from a worker-thread. the message is only handed over to the app. waiting for the app
+            # (call_from_thread) while this handler is locked deadlocks as soon as the app logs too
+            loop = self._app._loop
+            if loop is None:  # app is not running (anymore)
+                return
+            try:
+                loop.call_soon_threadsafe(self._app.add_log, message)
+            except RuntimeError:  # event-loop is closed
+                pass
         else:
+            self._app = app
             app.add_log(message)
 
 
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+in-process caches that are bound by their size
+"""
+import logging
+import threading
+import typing as t
+from collections import OrderedDict
+
+
+K = t.TypeVar('K', bound=t.Hashable)
+T = t.TypeVar('T')
+
+
+class LRUCache(t.Generic[K, T]):
+    r"""
+    thread-safe LRU-cache that is bound by the number of entries and their (estimated) size in bytes
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._nbytes = 0
+        self._entries: t.OrderedDict[K, t.Tuple[T, int]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        return (f"<{type(self).__name__} entries={len(self)} nbytes={self.nbytes} "
+                f"hits={self.hits} misses={self.misses}>")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: K) -> t.Optional[T]:
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: T, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            logging.debug(f"{type(self).__name__}: entry is too big for the cache ({nbytes} bytes)")
+            return
+        with self._lock:
+            self.discard(key)
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+                self.discard(next(iter(self._entries)))
+
+    def discard(self, key: K) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._nbytes -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
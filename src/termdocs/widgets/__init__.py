@@ -3,6 +3,7 @@
 r"""
 
 """
+from ._image_base import IMAGE_STORE
 from .color_image import ColorImage
 from .detail_image import DetailImage
 from .help import HelpWidget
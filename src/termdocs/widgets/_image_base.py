@@ -4,8 +4,11 @@ r"""
 TODO: replace ._image with ._frames with thumbnailed versions of the frames
 """
 import io
+import os
 import time
 import base64
+import hashlib
+import itertools
 import logging
 import mimetypes
 import typing as t
@@ -13,12 +16,20 @@ import os.path as p
 import urllib.parse
 from pathlib import Path
 import httpx
+import numpy as np
+import rich.console
+import rich.measure
+from rich.segment import Segment
+from rich.style import Style
 import textual.widget
-from textual.reactive import reactive, var
+import textual.geometry
+from textual.reactive import reactive
+from textual.strip import Strip
 import textual.timer
 import cairosvg
 from PIL import Image
 from util.href import HyperRef, DATA_URL_RE
+from util.lru import LRUCache
 from util.performance import measured_function
 
 
@@ -29,6 +40,152 @@ DECODE_MAP = {
     'base64': base64.b64decode,
     'base85': base64.b85decode,
 }
+# rough upper bound of the strips per cell (photos end up with almost one segment and style per cell)
+CELL_OVERHEAD = 96
+
+# images are shrunk to this size when they are decoded
+PRE_SHRINK_SIZE = (1000, 1000)
+
+# marks versions of web-resources that are a Last-Modified date (ETags are quoted)
+LAST_MODIFIED_PREFIX = "modified:"
+# (resolved href, version of the source)
+ImageKey = t.Tuple[str, str]
+# (source-digest, frame, width, height, widget-type, render-options)
+RenderKey = t.Tuple[str, int, int, int, str, t.Hashable]
+# identities for images that were set directly (not loaded from a source)
+_anonymous_images = itertools.count()
+
+
+class RenderedImage:
+    r"""
+    the cells of a rendered image(-frame). the strips of the lines are created when they are first requested
+    (see ImageBase.render_line) so that only the visible lines are converted
+    """
+
+    def __init__(self, cells: np.ndarray, available_width: int, align: str = "left"):
+        self.cells = cells
+        self.height, self.width = cells.shape
+        space = max(0, available_width - self.width)
+        # aligned in the available width like text (text-align)
+        if align == "center":
+            self.left = space // 2
+        elif align in ("right", "end"):
+            self.left = space
+        else:
+            self.left = 0
+        self._strips: t.List[t.Optional[Strip]] = [None] * self.height
+
+    def render_row(self, y: int) -> t.List[Segment]:
+        raise NotImplementedError()
+
+    def estimate_size(self) -> int:
+        return self.cells.nbytes + self.cells.size * CELL_OVERHEAD
+
+    def line(self, y: int) -> Strip:
+        strip = self._strips[y]
+        if strip is None:
+            segments = self.render_row(y)
+            if self.left:
+                segments.insert(0, Segment(" " * self.left))
+            strip = self._strips[y] = Strip(segments, cell_length=self.left + self.width)
+        return strip
+
+    def __rich_console__(
+            self, console: rich.console.Console, options: rich.console.ConsoleOptions,
+    ) -> rich.console.RenderResult:
+        newline = Segment.line()
+        for y in range(self.height):
+            yield from self.line(y)
+            yield newline
+
+    def __rich_measure__(
+            self, console: rich.console.Console, options: rich.console.ConsoleOptions,
+    ) -> rich.measure.Measurement:
+        return rich.measure.Measurement(self.left + self.width, self.left + self.width)
+
+
+class RenderCache(LRUCache[RenderKey, RenderedImage]):
+    r"""
+    rendered images keyed by (source-digest, frame, width, height, widget-type, render-options).
+    shared by all image-widgets so that the same image on another page (or in the other mode) isn't rendered again
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+
+
+RENDER_CACHE = RenderCache()
+
+
+class StoredImage:
+    r"""
+    decoded image of a source. animated images keep their data as every widget seeks through its own frames
+    """
+
+    __slots__ = ('digest', 'image', 'data')
+
+    def __init__(self, digest: str, image: Image.Image, data: t.Optional[bytes] = None):
+        self.digest = digest
+        self.image = image
+        self.data = data
+
+    def open(self) -> Image.Image:
+        if self.data is None:
+            return self.image
+        return Image.open(io.BytesIO(self.data))
+
+    def estimate_size(self) -> int:
+        pixels = self.image.width * self.image.height * len(self.image.getbands())
+        return pixels + (len(self.data) if self.data is not None else 0)
+
+
+class ImageStore(LRUCache[ImageKey, StoredImage]):
+    r"""
+    decoded (and pre-shrunk) images keyed by (resolved href, version).
+    the version is the mtime and size of files or the ETag (or Last-Modified date) of web-resources.
+    shared by all image-widgets so that the same source (badges, logos, icons) is only read and decoded once.
+    the cache is bound by the approximate bytes of the pixels (see --image-memory)
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 128 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+
+    def version_of(self, href: str) -> t.Optional[str]:
+        with self._lock:
+            return next((version for (key, version) in reversed(self._entries) if key == href), None)
+
+    def put(self, key: ImageKey, value: StoredImage, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            # isn't stored. the older version is still better than none
+            super().put(key, value, nbytes)
+            return
+        with self._lock:
+            # older versions of the same source can't be hit anymore
+            for old_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self.discard(old_key)
+            super().put(key, value, nbytes)
+
+
+IMAGE_STORE = ImageStore()
+
+
+def web_version(headers: httpx.Headers) -> str:
+    r"""
+    version of a web-resource: its ETag or (if there is none) its Last-Modified date
+    """
+    if 'ETag' in headers:
+        return headers['ETag']
+    if 'Last-Modified' in headers:
+        return f"{LAST_MODIFIED_PREFIX}{headers['Last-Modified']}"
+    return ""
+
+
+def revalidation_headers(version: t.Optional[str]) -> t.Dict[str, str]:
+    if not version:
+        return {}
+    if version.startswith(LAST_MODIFIED_PREFIX):
+        return {'If-Modified-Since': version[len(LAST_MODIFIED_PREFIX):]}
+    return {'If-None-Match': version}
 
 
 class ImageBase(textual.widget.Widget):
@@ -45,7 +202,10 @@ class ImageBase(textual.widget.Widget):
     _image: t.Optional[Image.Image] = reactive(None, layout=True)
     _is_animated: bool = False
     _timer: t.Optional[textual.timer.Timer] = None
-    _cached_frames: t.List[t.Tuple[int, t.Optional[textual.widget.RenderableType]]] = var(list)
+    _image_key: str = ""  # identity of the image-source (see RENDER_CACHE)
+    _rendered: t.Tuple[t.Optional[RenderKey], t.Optional[RenderedImage]] = (None, None)
+    # the rendered image and the base-style of the current update (see render_lines())
+    _frame: t.Tuple[t.Optional[RenderedImage], t.Optional[Style]] = (None, None)
 
     @property
     def image(self) -> t.Optional[Image.Image]:
@@ -53,14 +213,18 @@ class ImageBase(textual.widget.Widget):
 
     @image.setter
     def image(self, new: Image.Image):
-        self._cached_frames.clear()
+        self._set_image(new, key=f"anonymous-{next(_anonymous_images)}", pre_shrink=True)
+
+    def _set_image(self, new: Image.Image, key: str, pre_shrink: bool):
+        self._image_key = key
+        self._rendered = (None, None)
         self._image = new
         self._start_time = time.time()
         self._is_animated = getattr(self._image, 'is_animated', False)
         self.stop_frame_updates()
-        if not self._is_animated:
+        if pre_shrink and not self._is_animated:
             # note: removes frames
-            self._image.thumbnail((1000, 1000))  # pre-shrink for ?performance-gain?
+            self._image.thumbnail(PRE_SHRINK_SIZE)  # pre-shrink for ?performance-gain?
 
     def update_current_frame(self):
         if not self._is_animated:
@@ -107,8 +271,62 @@ class ImageBase(textual.widget.Widget):
             await self.load(self._src)
 
     def request_refresh(self):
+        self.update_current_frame()
         self.refresh()
 
+    def render_image(self) -> RenderedImage:
+        r"""
+        renders the current frame of the image for the current size
+        """
+        raise NotImplementedError()
+
+    def render_options(self) -> t.Hashable:
+        r"""
+        everything besides the image and the size that changes the result of render_image()
+        """
+        return self.styles.text_align
+
+    def render_key(self) -> RenderKey:
+        return (
+            self._image_key, self._image.tell(), self.size.width, self.size.height,
+            type(self).__name__, self.render_options(),
+        )
+
+    @property
+    def rendered(self) -> t.Optional[RenderedImage]:
+        if self.image is None:
+            return None
+        key = self.render_key()
+        last_key, rendered = self._rendered
+        if key == last_key:
+            return rendered
+        rendered = RENDER_CACHE.get(key)
+        if rendered is None:
+            rendered = self.render_image()
+            RENDER_CACHE.put(key, rendered, nbytes=rendered.estimate_size())
+            logging.debug(f"Rendered {type(self).__name__} {self.size} ({RENDER_CACHE!r})")
+        self._rendered = (key, rendered)
+        return rendered
+
+    def render(self) -> textual.widget.RenderableType:
+        rendered = self.rendered
+        return self._message if rendered is None else rendered
+
+    def render_lines(self, crop: textual.geometry.Region) -> t.List[Strip]:
+        # the rendered image (and the key to look it up) and the base-style are the same for all lines of an update
+        self._frame = self.rendered, self.visual_style.rich_style
+        return super().render_lines(crop)
+
+    def render_line(self, y: int) -> Strip:
+        # line-api: only the visible lines are requested (and then cached by textual until the next refresh)
+        rendered, style = self._frame
+        if rendered is None:
+            return super().render_line(y)
+        if y >= rendered.height:
+            return Strip.blank(self.size.width, style)
+        # the base-style gives the padding (and the braille-dots) the colors of the widget
+        return rendered.line(y).apply_style(style)
+
     async def load(self, src: t.Union[str, Path]):
         self._src = src = str(src)
         logging.debug(f"Loading image: {src[-40:]}")
@@ -129,10 +347,23 @@ class ImageBase(textual.widget.Widget):
     @textual.work(exit_on_error=False, exclusive=True)
     async def _load_web(self, url: str):
         try:
+            # a stored version is only downloaded again if it has changed
+            version = IMAGE_STORE.version_of(url)
+            if version == "":  # the server gave nothing to revalidate with. so it is reused as is
+                stored = IMAGE_STORE.get((url, version))
+                if stored is not None:
+                    self._show(stored)
+                    return
             async with httpx.AsyncClient() as client:
-                response = await client.get(url)
+                response = await client.get(url, headers=revalidation_headers(version))
+                if response.status_code == httpx.codes.NOT_MODIFIED:
+                    stored = IMAGE_STORE.get((url, version))
+                    if stored is not None:
+                        self._show(stored)
+                        return
+                    response = await client.get(url)
                 response.raise_for_status()
-                if response.headers.get('Content-Length') > WEB_IMAGE_MAX_SIZE:
+                if int(response.headers.get('Content-Length', 0)) > WEB_IMAGE_MAX_SIZE:
                     raise PermissionError("Web-Resource is too big")
                 buffer = io.BytesIO()
                 async for chunk in response.aiter_bytes(1024*10):  # ~10Kb/chunk
@@ -140,7 +371,7 @@ class ImageBase(textual.widget.Widget):
                         raise PermissionError("Web-Resource is too big")
                     buffer.write(chunk)
                 buffer.name = p.basename(urllib.parse.urlparse(url).path)
-                self._from_buffer(buffer)
+                self._from_buffer(buffer, key=(url, web_version(response.headers)))
         except Exception as error:
             logging.error(f"Failed to load resource: {url}", exc_info=error)
             self._message = f"{type(error).__name__}: {error}"
@@ -152,6 +383,12 @@ class ImageBase(textual.widget.Widget):
     @textual.work(exit_on_error=False, exclusive=True)
     async def _load_data_url(self, url: str):
         try:
+            # the data-url is its own version
+            key = hashlib.blake2b(url.encode(), digest_size=16).hexdigest(), ""
+            stored = IMAGE_STORE.get(key)
+            if stored is not None:
+                self._show(stored)
+                return
             match = DATA_URL_RE.match(url)
             groups = match.groupdict()
             mimetype = groups.get("mimetype")
@@ -162,7 +399,7 @@ class ImageBase(textual.widget.Widget):
                 raise LookupError(f"Unsupported encoding: {encoding}")
             decoder = DECODE_MAP[encoding]
             buffer = io.BytesIO(decoder(data))
-            self._from_buffer(buffer, mime=mimetype)
+            self._from_buffer(buffer, key=key, mime=mimetype)
         except Exception as error:
             logging.error(f"Failed to load resource: {url}", exc_info=error)
             self._message = f"{type(error).__name__}: {error}"
@@ -174,10 +411,17 @@ class ImageBase(textual.widget.Widget):
     @textual.work(exit_on_error=False, exclusive=True)
     async def _load_file(self, path: str):
         try:
+            path = p.abspath(path)
+            stat = os.stat(path)
+            key = path, f"{stat.st_mtime_ns}-{stat.st_size}"
+            stored = IMAGE_STORE.get(key)
+            if stored is not None:
+                self._show(stored)
+                return
             with open(path, 'rb') as file:
                 buffer = io.BytesIO(file.read())
                 buffer.name = file.name
-            self._from_buffer(buffer)
+            self._from_buffer(buffer, key=key)
         except Exception as error:
             logging.error(f"Failed to load resource: {path}", exc_info=error)
             self._message = f"{type(error).__name__}: {error}"
@@ -190,9 +434,12 @@ class ImageBase(textual.widget.Widget):
         out.seek(0)
         return out
 
-    def _from_buffer(self, buffer: t.BinaryIO, mime: t.Optional[str] = None):
+    def _from_buffer(self, buffer: t.BinaryIO, key: ImageKey, mime: t.Optional[str] = None):
         formats = None
         buffer.seek(0)
+        # the same bytes give the same image. no matter where they came from
+        digest = hashlib.blake2b(buffer.read(), digest_size=16).hexdigest()
+        buffer.seek(0)
         if mime is None:
             mime, _ = mimetypes.guess_type(buffer.name)
         if mime and mime.startswith("image/svg"):
@@ -200,22 +447,18 @@ class ImageBase(textual.widget.Widget):
             buffer = self._convert_svg2png(buffer)
             formats = ["PNG"]
         image = Image.open(buffer, formats=formats)
-        self.image = image
-
-    @property
-    def cached(self) -> t.Optional[textual.widget.RenderableType]:
-        frame = self._image.tell()
-        if frame >= len(self._cached_frames):
-            return None
-        for_width, rendered = self._cached_frames[frame]
-        if for_width == self.size.width:
-            return rendered
+        if getattr(image, 'is_animated', False):
+            buffer.seek(0)
+            stored = StoredImage(digest, image, data=buffer.read())
         else:
-            return None
+            # decoded once and shared. the widgets don't change it (see image.setter)
+            image.thumbnail(PRE_SHRINK_SIZE)
+            image.load()
+            stored = StoredImage(digest, image)
+        IMAGE_STORE.put(key, stored, nbytes=stored.estimate_size())
+        logging.debug(f"Decoded image {key[0][-40:]} ({IMAGE_STORE!r})")
+        self._show(stored)
 
-    @cached.setter
-    def cached(self, rendered: textual.widget.RenderableType):
-        frame = self._image.tell()
-        if len(self._cached_frames) <= frame:
-            self._cached_frames.extend([(0, None)] * (frame + 1 - len(self._cached_frames)))
-        self._cached_frames[frame] = (self.size.width, rendered)
+    def _show(self, stored: StoredImage):
+        # the stored image is shared and already pre-shrunk (see _from_buffer())
+        self._set_image(stored.open(), key=stored.digest, pre_shrink=False)
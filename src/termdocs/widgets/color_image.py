@@ -1,20 +1,90 @@
 #!/usr/bin/python3
 # -*- coding=utf-8 -*-
 r"""
-
+image-widget with two pixels per cell (background-color: top, foreground-color of '▄': bottom)
 """
-import functools
-import math
 import typing as t
+import numpy as np
 from PIL import Image
-from rich.text import Text
-import textual.app
-import textual.color
-from ._image_base import ImageBase
+from rich.color import Color, ColorType
+from rich.color_triplet import ColorTriplet
+from rich.segment import Segment
+from rich.style import Style
+from ._image_base import ImageBase, RenderedImage
 
 
 RGB = t.Tuple[int, int, int]
 RGBA = t.Tuple[int, int, int, int]
+HALF_BLOCK = "\u2584"
+
+
+def composite(pixels: np.ndarray, background: RGB) -> np.ndarray:
+    r"""
+    alpha-blends the RGBA-pixels onto the background. returns the RGB-pixels
+    """
+    alpha = pixels[..., 3:4].astype(np.uint32)
+    blended = (np.asarray(background, dtype=np.uint32) * (255 - alpha) + pixels[..., :3] * alpha) // 255
+    return blended.astype(np.uint8)
+
+
+def truecolor(packed: int) -> Color:
+    r"""
+    the same as Color.from_rgb() for a color packed into one integer (0xRRGGBB) but without the slow formatting
+    """
+    return Color(
+        f"#{packed:06x}", ColorType.TRUECOLOR,
+        triplet=ColorTriplet(packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF),
+    )
+
+
+def half_block_cells(pixels: np.ndarray, background: RGB) -> np.ndarray:
+    r"""
+    cells for RGBA-pixels with the shape (height, width, 4).
+    every cell is the pair of its top and bottom color packed into one integer (0xRRGGBB_RRGGBB)
+    """
+    height, width, _ = pixels.shape
+    has_alpha = pixels[..., 3].min() < 255
+    if height % 2:
+        # the missing bottom-row is transparent (black for images without alpha)
+        pixels = np.concatenate([pixels, np.zeros((1, width, 4), dtype=pixels.dtype)])
+    rgb = composite(pixels, background=background) if has_alpha else pixels[..., :3]
+    packed = (rgb[..., 0].astype(np.uint64) << 16) | (rgb[..., 1].astype(np.uint64) << 8) | rgb[..., 2]
+    return (packed[0::2] << 24) | packed[1::2]
+
+
+class HalfBlockImage(RenderedImage):
+    r"""
+    rendered image with two pixels per cell (see half_block_cells())
+    """
+
+    def __init__(self, cells: np.ndarray, available_width: int, align: str = "left"):
+        super().__init__(cells=cells, available_width=available_width, align=align)
+        self._colors: t.Dict[int, Color] = {}
+        self._styles: t.Dict[int, Style] = {}
+
+    def color(self, packed: int) -> Color:
+        color = self._colors.get(packed)
+        if color is None:
+            color = self._colors[packed] = truecolor(packed)
+        return color
+
+    def style(self, cell: int) -> Style:
+        style = self._styles.get(cell)
+        if style is None:
+            style = self._styles[cell] = Style.from_color(
+                color=self.color(cell & 0xFFFFFF), bgcolor=self.color(cell >> 24),
+            )
+        return style
+
+    def render_row(self, y: int) -> t.List[Segment]:
+        # neighbouring cells with the same colors are merged into one segment
+        row = self.cells[y]
+        starts = np.concatenate([[0], np.flatnonzero(row[1:] != row[:-1]) + 1])
+        lengths = np.diff(starts, append=len(row))
+        return [
+            Segment(HALF_BLOCK * length, self.style(cell))
+            for length, cell in zip(lengths.tolist(), row[starts].tolist())
+        ]
 
 
 class ColorImage(ImageBase):
@@ -40,68 +110,20 @@ class ColorImage(ImageBase):
                 pixel_count += 1
         return round(total / pixel_count)
 
-    def render(self) -> textual.app.RenderableType:
-        if self.image is None:
-            return self._message
-        self.update_current_frame()
-        if self.cached:
-            return self.cached
+    def render_options(self) -> t.Hashable:
+        return super().render_options(), self.background_colors[0].rgb
 
+    def render_image(self) -> HalfBlockImage:
         img = self.image.convert('RGBA')
         img.thumbnail((self.size.width, self.size.height * 2))
 
-        # not using
-        # f"\033[48;2;{tr};{tg};{tb}m\033[38;2;{br};{bg};{bb}m\u2584"
-        # to *greatly* improve performance by only adding tcodes on color change
-
-        lines = []
-        last_top_color: t.Optional[RGBA] = None
-        last_bottom_color: t.Optional[RGBA] = None
-
-        if img.getextrema()[3][0] < 255:  # check image has alpha
-            # background-r/g/b
-            # manual way depending on the brightness of the image
-            # br, bg, bb = (255, 255, 255) if self.image_brightness(img) < 128 else (0, 0, 0)
-            # "smart" way by just grabbing the background
-            br, bg, bb, _ = self.background_colors[0]
-
-            @functools.lru_cache()
-            def get_color(rgba: RGBA) -> RGB:
-                cr, cg, cb, a = rgba  # color-r/g/b
-                if a == 255:  # no need to make calculations
-                    return cr, cg, cb
-                if a == 0:  # no need to make calculations
-                    return br, bg, bb
-                ia = 255 - a  # inverted alpha
-                return (
-                    int((br*ia + cr*a) / 255),
-                    int((bg*ia + cg*a) / 255),
-                    int((bb*ia + cb*a) / 255),
-                )
-        else:
-            def get_color(rgba: RGBA) -> RGB:
-                return rgba[:3]
-
-        for y in range(math.ceil(img.height / 2)):
-            characters = []
-            for x in range(img.width):
-                character = "\u2584"
-                top = y * 2
-                top_color = img.getpixel((x, top))
-                if top_color != last_top_color:
-                    last_top_color = top_color
-                    r, g, b = get_color(top_color)
-                    character = f"\033[48;2;{r};{g};{b}m{character}"
-                bottom = y * 2 + 1
-                bottom_color = img.getpixel((x, bottom)) if bottom < img.height else (0, 0, 0, 0)
-                if bottom_color != last_bottom_color:
-                    last_bottom_color = bottom_color
-                    r, g, b = get_color(bottom_color)
-                    character = f"\033[38;2;{r};{g};{b}m{character}"
-
-                characters.append(character)
-
-            lines.append(''.join(characters))
-        result = Text.from_ansi('\n'.join(lines) + '\033[39m\033[49m')
-        self.cached = result
-        return result
+        # the background behind (semi-)transparent pixels
+        # manual way depending on the brightness of the image
+        # background = (255, 255, 255) if self.image_brightness(img) < 128 else (0, 0, 0)
+        # "smart" way by just grabbing the background
+        background = self.background_colors[0].rgb
+        return HalfBlockImage(
+            cells=half_block_cells(np.asarray(img), background=background),
+            available_width=self.size.width,
+            align=self.styles.text_align,
+        )
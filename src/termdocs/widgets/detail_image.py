@@ -1,12 +1,13 @@
 #!/usr/bin/python3
 # -*- coding=utf-8 -*-
 r"""
-
+image-widget with braille-characters (2x4 dots per cell)
 """
 import math
-from textual.app import RenderableType
-from PIL import Image
-from ._image_base import ImageBase
+import typing as t
+import numpy as np
+from rich.segment import Segment
+from ._image_base import ImageBase, RenderedImage
 
 
 OFFSET = 0x2800
@@ -30,51 +31,67 @@ OFFSETMAP = {
     (1, 2): R3,
     (1, 3): R4,
 }
+# bit of every dot in a cell as [oy][ox]
+DOT_WEIGHTS = np.array([[OFFSETMAP[(ox, oy)] for ox in range(2)] for oy in range(4)], dtype=np.uint32)
+# 4x4 bayer-matrix for the ordered dithering (thresholds as fraction of the full range)
+BAYER = (np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+]) + 0.5) / 16
+# maximum of (light + 1) * alpha
+FULL = 256 * 255
+
+
+def braille_cells(pixels: np.ndarray, dither: bool = False) -> np.ndarray:
+    r"""
+    braille-characters (as code-points) for LA-pixels with the shape (height, width, 2).
+    dots are set for the pixels that are brighter than the average (darker if the image is dark).
+    with `dither` the threshold varies per pixel (ordered dithering) which shows shades instead of only edges
+    """
+    height, width, _ = pixels.shape
+    color = (pixels[..., 0].astype(np.int64) + 1) * pixels[..., 1]
+    boundary = round(int(color.sum()) / (width * height))
+    invert = boundary < (50 * 255)
+    if dither:
+        if invert:
+            color = FULL - color
+        thresholds = np.tile(BAYER, (math.ceil(height / 4), math.ceil(width / 4)))[:height, :width] * FULL
+        dots = color > thresholds
+    else:
+        dots = color < boundary if invert else color > boundary
+
+    # pad to full cells. the missing pixels have no dots
+    rows, columns = math.ceil(height / 4), math.ceil(width / 2)
+    padded = np.zeros((rows * 4, columns * 2), dtype=np.uint32)
+    padded[:height, :width] = dots
+    cells = (padded.reshape(rows, 4, columns, 2) * DOT_WEIGHTS[None, :, None, :]).sum(axis=(1, 3), dtype=np.uint32)
+    return (cells + OFFSET).astype('<u4')
+
+
+class BrailleImage(RenderedImage):
+    r"""
+    rendered image with 2x4 dots per cell (see braille_cells())
+    """
+
+    def render_row(self, y: int) -> t.List[Segment]:
+        return [Segment(self.cells[y].tobytes().decode('utf-32-le'))]
 
 
 class DetailImage(ImageBase):
-    @staticmethod
-    def image_boundary(img: Image.Image) -> int:
-        total = 0
-        for y in range(img.height):
-            for x in range(img.width):
-                light, alpha = img.getpixel((x, y))
-                total += (light + 1) * alpha
-        return round(total / (img.width * img.height))
+    # ordered dithering instead of a single threshold (see braille_cells())
+    DITHER: bool = False
 
-    def render(self) -> RenderableType:
-        if self.image is None:
-            return self._message
-        self.update_current_frame()
-        if self.cached:
-            return self.cached
+    def render_options(self) -> t.Hashable:
+        return super().render_options(), self.DITHER
 
+    def render_image(self) -> BrailleImage:
         img = self.image.convert('LA')
         img.thumbnail((self.size.width * 2, self.size.height * 4))
 
-        tw, th = math.ceil(img.width / 2), math.ceil(img.height / 4)
-        boundary = self.image_boundary(img)
-        invert = boundary < (50 * 255)
-
-        lines = []
-        for ty in range(th):
-            characters = []
-            for tx in range(tw):
-                b = X0
-                for oy in range(4):
-                    for ox in range(2):
-                        rx, ry = (tx * 2) + ox, (ty * 4) + oy
-                        try:
-                            light, alpha = img.getpixel((rx, ry))
-                        except IndexError:
-                            pass
-                        else:
-                            color = (light + 1) * alpha
-                            if color < boundary if invert else color > boundary:
-                                b |= OFFSETMAP[(ox, oy)]
-                characters.append(chr(OFFSET + b))
-            lines.append(''.join(characters))
-        result = '\n'.join(lines)
-        # result = '\n'.join(line.center(self.size.width) for line in lines)
-        self.cached = result
-        return result
+        return BrailleImage(
+            cells=braille_cells(np.asarray(img), dither=self.DITHER),
+            available_width=self.size.width,
+            align=self.styles.text_align,
+        )
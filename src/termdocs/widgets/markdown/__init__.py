@@ -1,31 +1,47 @@
 #!/usr/bin/python3
 # -*- coding=utf-8 -*-
 r"""
-TODO: html_inline in text/header
+
 """
+import time
+import bisect
+import asyncio
 import logging
 import random
+import collections
 import functools
 import typing as t
 from pathlib import Path
+import textual
 import textual.events
+import textual.geometry
+import textual.worker
 import textual.widget
 import textual.widgets
 import textual.reactive
 import textual.containers
 from textual.app import ComposeResult
-import rich.syntax
+from textual.strip import Strip
+import rich.cells
+import rich.console
+import rich.padding
+from rich.segment import Segment
 from rich.text import Text, Style
 import markdown_it
-import markdown_it.tree
-import markdown_it.token
-import markdownify
 from util import HyperRef
-from util.constants import SIZE2LANGUAGES
 from ..color_image import ColorImage
 from ..detail_image import DetailImage
 from . import plugins as markdown_plugins
-from ._emojis import EMOJIS as EMOJI_MAPPING
+from .document import ParsedDocument, ParsedChunk, Heading, node_plaintext
+from .nodes import Node
+from .incremental import block_keys, diff_blocks
+from .highlight import HighlightedCode
+from .inline import ComponentStyles, InlineRenderer
+from . import stream
+from . import backends
+from . import htmlconvert
+from .htmlconvert import html_plugin, html_to_tree
+from .cache import DocumentCache, TokenDiskCache, default_cache_dir, parser_fingerprint
 
 
 BULLETS = ["\u25CF ", "▪ ", "‣ ", "• ", "⭑ "]
@@ -41,6 +57,18 @@ markdown_parser.use(markdown_plugins.toc_plugin)
 markdown_parser.use(markdown_plugins.attrs_plugin)
 markdown_parser.use(markdown_plugins.attrs_block_plugin)
 markdown_parser.use(markdown_plugins.footnote_plugin)
+markdown_parser.use(html_plugin)
+# markdown-it-pyrs (if installed) for the documents that don't need the python-plugins
+parser_backend = backends.create_backend(markdown_parser)
+
+DOCUMENT_CACHE: DocumentCache[ParsedDocument] = DocumentCache()
+TOKEN_CACHE = TokenDiskCache(
+    directory=default_cache_dir(),
+    fingerprint=parser_fingerprint(
+        markdown_parser, markdown_plugins, markdown_plugins.EMOJI_TABLE_FILE, htmlconvert, backends,
+        backend=parser_backend.name,
+    ),
+)
 
 
 class MarkdownElement(textual.widget.Widget):
@@ -48,9 +76,25 @@ class MarkdownElement(textual.widget.Widget):
     MarkdownElement {
         height: auto;
     }
+    /* <p align="..."> */
+    .align-left, .align-left MarkdownStatic {
+        text-align: left;
+    }
+    .align-center, .align-center MarkdownStatic {
+        text-align: center;
+    }
+    .align-right, .align-right MarkdownStatic {
+        text-align: right;
+    }
+    .align-justify, .align-justify MarkdownStatic {
+        text-align: justify;
+    }
     """
 
-    def __init__(self, node: markdown_it.tree.SyntaxTreeNode, root: 'CustomMarkdown'):
+    # component-class that is added to the style of links (see InlineRenderer)
+    INLINE_LINK_COMPONENT: t.Optional[str] = None
+
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
         self.node = node
         self.root = root
         super().__init__()
@@ -65,26 +109,24 @@ class MarkdownElement(textual.widget.Widget):
         """Called on link click."""
         logging.debug(f"action_link({href!r})")
         if HyperRef.check_is_idref(href):
-            self.scroll_to_header(href=href)
+            await self.scroll_to_header(href=href)
         else:
             self.post_message(CustomMarkdown.LinkClicked(root=self.root, href=href))
 
-    def scroll_to_header(self, href: str):
+    async def scroll_to_header(self, href: str):
         for id_, should_warn in self.iterate_possible_ids(href):
-            try:
-                widget = self.root.query_one(id_)
-            except textual.app.NoMatches:
+            widget = await self.root.reveal_anchor(id_.removeprefix('#'))
+            if widget is None:
                 continue
-            else:
-                if should_warn:
-                    self.notify(
-                        message=f"Header {href!r} not found and {id_!r} was used instead",
-                        severity='warning',
-                        timeout=5
-                    )
-                logging.debug(f"Scrolling to widget {href}")
-                self.scroll_to_center(widget=widget, animate=True)
-                break
+            if should_warn:
+                self.notify(
+                    message=f"Header {href!r} not found and {id_!r} was used instead",
+                    severity='warning',
+                    timeout=5
+                )
+            logging.debug(f"Scrolling to widget {href}")
+            self.root.scroll_to_element(widget)
+            break
         else:
             logging.error(f"Header {href!r} not found in the document")
             self.notify(
@@ -105,14 +147,15 @@ class MarkdownElement(textual.widget.Widget):
 
     @property
     def all_ids(self) -> t.List[str]:
-        return [
-            f"#{widget.id}" for widget in self.root.query(None) if widget.id
-        ]
+        return [f"#{anchor}" for anchor in self.root.document.anchors]
 
     def get_closest_id(self, id_: str, cutoff=0.6) -> t.Optional[str]:
-        import difflib
-        matches = difflib.get_close_matches(id_, self.all_ids, n=1, cutoff=cutoff)
-        return matches[0] if matches else None
+        match = self.root.document.anchors.closest(id_.removeprefix('#'), cutoff=cutoff)
+        return f"#{match}" if match else None
+
+    @property
+    def inline_renderer(self) -> InlineRenderer:
+        return self.root.inline_renderer(self)
 
 
 class MarkdownStatic(MarkdownElement):
@@ -152,73 +195,71 @@ class MarkdownInline(MarkdownElement):
     .footnote {
         text-style: italic dim;
     }
+    .kbd {
+        text-style: bold;
+        background: $background-lighten-3;
+    }
+    .sub, .sup {
+        text-style: dim;
+    }
     """
 
-    COMPONENT_CLASSES = {"em", "strong", "s", "code_inline", "footnote"}
-
-    def _recursive_compose(self, node, style=None):
-        style = style or Style()
-
-        for node in node.children:
-            if node.type == "text":
-                yield Text(text=node.content, style=style)
-            elif node.type == "hardbreak":
-                yield Text(text='\n')
-            elif node.type == "softbreak":
-                yield Text(text=' ', style=style)
-            elif node.type == "image":
-                yield MarkdownImage(node=node, root=self.root)
-            elif node.type == "link":
-                href = node.attrGet('href')
-                action = f"link({href!r})"
-                yield from self._recursive_compose(
-                    node=node,
-                    style=style + Style.from_meta({"@click": action})
-                )
-            elif node.type == "code_inline":
-                yield Text(
-                    text=node.content,
-                    style=style + self.get_component_rich_style(node.type, partial=True)
-                )
-            # italic | bold | strikethrough
-            elif node.type in {'em', 'strong', 's'}:
-                yield from self._recursive_compose(
-                    node=node,
-                    style=style + self.get_component_rich_style(node.type, partial=True)
-                )
-            elif node.type == "emoji":
-                emoji = EMOJI_MAPPING.get(node.content) or f":{node.content}:"
-                yield Text(text=emoji, style=style)
-            elif node.type == "footnote_ref":
-                footnote_id = node.meta['id']
-                action = f"link({f'#footnote-{self.root.DOCUMENT_ID}-{footnote_id}'!r})"
-                yield Text(
-                    text=f"^{footnote_id}",
-                    style=style + self.get_component_rich_style("footnote") + Style.from_meta({"@click": action})
-                )
-            else:
-                logging.warning(f"Unknown inline node-type: {node.type}")
-                logging.debug(f"{vars(node)}")
+    COMPONENT_CLASSES = {"em", "strong", "s", "code_inline", "footnote", "kbd", "sub", "sup"}
 
-    def _clean_compose(self, composed: iter):
-        text = Text()
+    def compose(self) -> ComposeResult:
+        prefix = None
         next_sibling = self.node.next_sibling
         if next_sibling and next_sibling.type == "footnote_anchor":
-            text.append(text=f"^{next_sibling.meta['id']}: ", style=Style(dim=True, italic=True))
+            prefix = Text(f"^{next_sibling.meta['id']}: ", style=Style(dim=True, italic=True))
 
-        for item in composed:
+        for item in self.inline_renderer.render(self.node, image=lambda node: MarkdownImage(node=node, root=self.root)):
             if isinstance(item, Text):
-                text.append_text(item)
+                if prefix is not None:
+                    item = prefix + item
+                    prefix = None
+                yield MarkdownStatic(item, root=self.root)
             else:
-                yield MarkdownStatic(text, root=self.root)
-                text = Text()
                 yield item
-        yield MarkdownStatic(text, root=self.root)
+
+
+class _MarkdownInlineText(MarkdownElement):
+    r"""
+    element that renders inline content into its own text instead of child-widgets
+    """
+
+    DEFAULT_CSS = r"""
+    .em {
+        text-style: italic;
+    }
+    .strong {
+        text-style: bold;
+    }
+    .s {
+        text-style: strike;
+    }
+    .code_inline {
+        text-style: bold dim;
+        background: $background-lighten-2;
+    }
+    .footnote {
+        text-style: italic dim;
+    }
+    .kbd {
+        text-style: bold;
+        background: $background-lighten-3;
+    }
+    .sub, .sup {
+        text-style: dim;
+    }
+    """
+
+    COMPONENT_CLASSES = MarkdownInline.COMPONENT_CLASSES
 
     def compose(self) -> ComposeResult:
-        yield from self._clean_compose(
-            self._recursive_compose(self.node)
-        )
+        yield from ()
+
+    def render_inline(self, node: Node) -> Text:
+        return self.inline_renderer.render_text(node)
 
 
 class MarkdownHorizontalRule(MarkdownElement):
@@ -290,118 +331,32 @@ class MarkdownHeading(MarkdownElement):
     .footnote {
         text-style: italic dim;
     }
+    .kbd {
+        text-style: bold;
+        background: $background-lighten-3;
+    }
+    .sub, .sup {
+        text-style: dim;
+    }
     """
 
-    COMPONENT_CLASSES = {"em", "strong", "s", "code_inline", "footnote"}
+    COMPONENT_CLASSES = {"em", "strong", "s", "code_inline", "footnote", "kbd", "sub", "sup"}
+    INLINE_LINK_COMPONENT = "footnote"
 
-    def __init__(self, node: markdown_it.tree.SyntaxTreeNode, root: 'CustomMarkdown'):
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
         super().__init__(node=node, root=root)
         if self.id is None:
-            self.id = self._generate_id()
+            self.id = self.root.document.slugs.id_for(node)
         logging.info(f"Header with id='{self.id}'")
         self.add_class(self.node.tag)
 
-    def _render_inline(self, node: markdown_it.tree.SyntaxTreeNode, style: Style = None) -> Text:
-        text = Text()
-        style = style or Style()
-
-        for node in node.children:
-            if node.type == "text":
-                text.append(text=node.content, style=style)
-            elif node.type == "hardbreak":
-                text.append(text='\n')
-            elif node.type == "softbreak":
-                text.append(text=' ', style=style)
-            elif node.type == "image":
-                _style = style
-                txt = "🖼"
-                href = node.attrGet("src")
-                if href:
-                    action = f"link({href!r})"
-                    _style = style + Style.from_meta({'@click': action})
-                alt = node.attrGet("alt")
-                if alt:
-                    txt += f" ({alt})"
-                text.append(
-                    text=txt,
-                    style=_style
-                )
-            elif node.type == "link":
-                href = node.attrGet('href')
-                action = f"link({href!r})"
-                text.append(
-                    self._render_inline(
-                        node=node,
-                        style=style + self.get_component_rich_style("footnote") + Style.from_meta({"@click": action})
-                    )
-                )
-            elif node.type == "code_inline":
-                text.append(
-                    text=node.content,
-                    style=style + self.get_component_rich_style(node.type, partial=True)
-                )
-            # italic | bold | strikethrough
-            elif node.type in {'em', 'strong', 's'}:
-                text.append(
-                    self._render_inline(
-                        node=node,
-                        style=style + self.get_component_rich_style(node.type, partial=True)
-                    )
-                )
-            elif node.type == "emoji":
-                emoji = EMOJI_MAPPING.get(node.content) or f":{node.content}:"
-                text.append(text=emoji, style=style)
-            elif node.type == "footnote_ref":
-                footnote_id = node.meta['id']
-                action = f"link({f'#footnote-{self.root.DOCUMENT_ID}-{footnote_id}'!r})"
-                text.append(
-                    text=f"[^{footnote_id}]",
-                    style=style + Style.from_meta({"@click": action})
-                )
-            else:
-                logging.warning(f"Unknown inline node-type: {node.type}")
-                logging.debug(f"{vars(node)}")
-        return text
-
-    def _render_plaintext(self, node: markdown_it.tree.SyntaxTreeNode) -> str:
-        text = []
-        for node in node.children:
-            if node.type == "text":
-                text.append(node.content)
-            elif node.children:
-                text.append(self._render_plaintext(node=node))
-        return ''.join(text)
-
-    def _generate_id(self):
-        r"""
-        Valid Identifier: '[a-zA-Z_\-][a-zA-Z0-9_\-]*'
-        """
-        import re
-        plain = self.rendered_plaintext
-        plain = plain.strip().lower().replace(' ', '-')
-        head_match = re.match(r"[a-zA-Z_\-]", plain)
-        head = head_match.group()
-        body_matches = re.finditer(r"[a-zA-Z0-9_\-]+", plain[head_match.end():])
-        base_id = head + ''.join(_.group() for _ in body_matches)
-        real_id = base_id
-        i = 0
-        while True:
-            try:
-                self.app.query_one(f"#{real_id}")
-            except textual.app.NoMatches:
-                break
-            else:
-                i += 1
-                real_id = f"{base_id}-{i}"
-        return real_id
-
     @functools.cached_property
     def rendered_text(self) -> Text:
-        return self._render_inline(self.node.children[0])
+        return self.inline_renderer.render_text(self.node.children[0])
 
     @functools.cached_property
     def rendered_plaintext(self) -> str:
-        return self._render_plaintext(node=self.node)
+        return node_plaintext(node=self.node)
 
     def render(self) -> textual.app.RenderableType:
         return self.rendered_text
@@ -549,23 +504,16 @@ class MarkdownCodeBlock(MarkdownElement):
     }
     """
 
-    def __init__(self, node: markdown_it.tree.SyntaxTreeNode, root: 'CustomMarkdown'):
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
         super().__init__(node=node, root=root)
         self._code = node.content.strip()
         self._language = node.info
-        self._renderable = rich.syntax.Syntax(
-            code=self._code,
-            lexer=self._language,
-            theme='ansi_dark',
-            dedent=True,
-            line_numbers=bool(self._language),
-            # code_width=80,
-            tab_size=2 if self._language in SIZE2LANGUAGES else 4,
-            word_wrap=False,
-            background_color=None,
-            indent_guides=False,
-            padding=0,
-        )
+        # highlighted once it's painted for the first time (see HighlightedCode)
+        self._renderable = HighlightedCode(code=self._code, lexer=self._language)
+
+    def get_content_height(self, container: textual.geometry.Size, viewport: textual.geometry.Size, width: int) -> int:
+        # known without rendering (and highlighting) the code
+        return self._renderable.line_count
 
     def render(self) -> textual.app.RenderableType:
         return self._renderable
@@ -657,6 +605,216 @@ class MarkdownTd(MarkdownElement):
         yield from render_node(node=self.node, root=self.root)
 
 
+class MarkdownLineTable(_MarkdownInlineText):
+    r"""
+    table that is rendered line by line (textual line-api) instead of a widget per row and cell.
+    the column-widths are computed once from the cells and only the rows in view are rendered
+    """
+
+    DEFAULT_CSS = r"""
+    MarkdownLineTable {
+        border: round $primary-background-lighten-2;
+    }
+    MarkdownLineTable > .table--header {
+        text-style: bold italic;
+    }
+    MarkdownLineTable > .table--separator {
+        color: $primary-background-lighten-2;
+    }
+    """
+
+    COMPONENT_CLASSES = _MarkdownInlineText.COMPONENT_CLASSES | {"table--header", "table--separator"}
+
+    # number of rendered rows that are kept
+    ROW_CACHE_SIZE = 256
+    CELL_PADDING = 1
+
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
+        super().__init__(node=node, root=root)
+        self._layouts: t.Dict[int, t.Tuple[t.List[int], t.List[int]]] = {}
+        self._rendered_rows: t.OrderedDict[t.Tuple[int, int], t.List[Strip]] = collections.OrderedDict()
+
+    @classmethod
+    def supports(cls, node: Node) -> bool:
+        if node.type != "table":
+            return False
+        # images are widgets and can't be part of a line
+        return not any(
+            "![" in cell.children[0].content or "<img" in cell.children[0].content
+            for section in node.children for row in section.children for cell in row.children if cell.children
+        )
+
+    @functools.cached_property
+    def rows(self) -> t.List[Node]:
+        return [row for section in self.node.children for row in section.children if row.type == "tr"]
+
+    @functools.cached_property
+    def header_rows(self) -> int:
+        return sum(len(section.children) for section in self.node.children if section.type == "thead")
+
+    @functools.cached_property
+    def column_count(self) -> int:
+        return max((len(row.children) for row in self.rows), default=0)
+
+    @staticmethod
+    def cell_align(cell: Node) -> str:
+        style = str(cell.attrGet("style") or "")
+        for align in ("center", "right"):
+            if f"text-align:{align}" in style.replace(' ', ''):
+                return align
+        return "left"
+
+    @staticmethod
+    def cell_plaintext(node: Node) -> str:
+        r"""
+        plain text of what the InlineRenderer renders. enough to lay out the table without styling every cell
+        """
+        parts = []
+        for child in node.children:
+            if child.type in {"text", "code_inline"}:
+                parts.append(child.content)
+            elif child.type == "softbreak":
+                parts.append(" ")
+            elif child.type == "hardbreak":
+                parts.append("\n")
+            elif child.type == "emoji":
+                parts.append(markdown_plugins.emoji_for(child.content) or f":{child.content}:")
+            elif child.type == "footnote_ref":
+                parts.append(f"^{child.meta['id']}")
+            elif child.children:
+                parts.append(MarkdownLineTable.cell_plaintext(child))
+        return ''.join(parts)
+
+    @functools.cached_property
+    def plaintexts(self) -> t.List[t.List[str]]:
+        return [
+            [self.cell_plaintext(cell.children[0]) if cell.children else "" for cell in row.children]
+            for row in self.rows
+        ]
+
+    def row_cells(self, index: int) -> t.List[Text]:
+        row = self.rows[index]
+        return [self.render_inline(cell.children[0]) if cell.children else Text() for cell in row.children]
+
+    def column_widths(self, width: int) -> t.List[int]:
+        r"""
+        natural widths of the columns (longest cell) that are scaled to fill the available width
+        """
+        count = self.column_count
+        if not count:
+            return []
+        padding = 2 * self.CELL_PADDING
+        natural = [padding + 1] * count
+        for row in self.plaintexts:
+            for i, plain in enumerate(row):
+                cell_width = max(map(rich.cells.cell_len, plain.split('\n'))) + padding
+                if cell_width > natural[i]:
+                    natural[i] = cell_width
+        available = max(width, count * (padding + 1))
+        if sum(natural) <= available:
+            extra = available - sum(natural)
+            widths = [w + (extra * w) // sum(natural) for w in natural]
+        else:
+            # columns that are narrower than their share keep their width. the others share the rest
+            widths = [0] * count
+            remaining, open_columns = available, set(range(count))
+            while open_columns:
+                share = remaining // len(open_columns)
+                narrow = {i for i in open_columns if natural[i] <= share}
+                if not narrow:
+                    for i in open_columns:
+                        widths[i] = max(padding + 1, share)
+                    break
+                for i in narrow:
+                    widths[i] = natural[i]
+                    remaining -= natural[i]
+                open_columns -= narrow
+        widths[-1] += available - sum(widths)
+        return widths
+
+    def wrap_cell(self, text: Text, width: int, align: str) -> t.List[Text]:
+        lines = text.wrap(self.app.console, width, overflow="fold")
+        for line in lines:
+            line.align(align, width)
+        return list(lines)
+
+    def layout(self, width: int) -> t.Tuple[t.List[int], t.List[int]]:
+        r"""
+        column-widths and the offset of every row (and the total height as last offset)
+        """
+        layout = self._layouts.get(width)
+        if layout is not None:
+            return layout
+        widths = self.column_widths(width)
+        inner_widths = [w - 2 * self.CELL_PADDING for w in widths]
+        offsets = [0]
+        console = self.app.console
+        for index, row in enumerate(self.plaintexts):
+            height = 1
+            for plain, inner_width in zip(row, inner_widths):
+                if '\n' in plain or rich.cells.cell_len(plain) > inner_width:
+                    height = max(height, len(Text(plain).wrap(console, inner_width, overflow="fold")))
+            # every row but the first has a separator-line above it
+            offsets.append(offsets[-1] + height + (1 if index else 0))
+        layout = self._layouts[width] = (widths, offsets)
+        return layout
+
+    def get_content_height(self, container: textual.geometry.Size, viewport: textual.geometry.Size, width: int) -> int:
+        return self.layout(width)[1][-1]
+
+    def notify_style_update(self) -> None:
+        super().notify_style_update()
+        self._rendered_rows.clear()
+
+    def render_row(self, index: int, width: int) -> t.List[Strip]:
+        key = (index, width)
+        strips = self._rendered_rows.get(key)
+        if strips is not None:
+            self._rendered_rows.move_to_end(key)
+            return strips
+        widths, offsets = self.layout(width)
+        base_style = self.rich_style
+        if index < self.header_rows:
+            base_style += self.get_component_rich_style("table--header", partial=True)
+        strips = []
+        if index:
+            strips.append(Strip([Segment("─" * width, self.get_component_rich_style("table--separator"))], width))
+        row, cells = self.rows[index], self.row_cells(index)
+        columns = []
+        for i, column_width in enumerate(widths):
+            inner_width = column_width - 2 * self.CELL_PADDING
+            if i < len(cells):
+                columns.append(self.wrap_cell(cells[i], inner_width, self.cell_align(row.children[i])))
+            else:
+                columns.append([])
+        padding = Segment(" " * self.CELL_PADDING, base_style)
+        height = offsets[index + 1] - offsets[index] - (1 if index else 0)
+        for y in range(height):
+            segments = []
+            for lines, column_width in zip(columns, widths):
+                segments.append(padding)
+                if y < len(lines):
+                    segments.extend(Segment.apply_style(
+                        lines[y].render(self.app.console), style=base_style
+                    ))
+                else:
+                    segments.append(Segment(" " * (column_width - 2 * self.CELL_PADDING), base_style))
+                segments.append(padding)
+            strips.append(Strip(segments).adjust_cell_length(width, base_style))
+        self._rendered_rows[key] = strips
+        while len(self._rendered_rows) > self.ROW_CACHE_SIZE:
+            self._rendered_rows.popitem(last=False)
+        return strips
+
+    def render_line(self, y: int) -> Strip:
+        width = self.size.width
+        _, offsets = self.layout(width)
+        if y < 0 or y >= offsets[-1]:
+            return Strip.blank(width, self.rich_style)
+        index = bisect.bisect_right(offsets, y) - 1
+        return self.render_row(index, width)[y - offsets[index]]
+
+
 class MarkdownHtmlBlock(MarkdownElement):
     DEFAULT_CSS = r"""
     MarkdownHtmlBlock {
@@ -665,12 +823,51 @@ class MarkdownHtmlBlock(MarkdownElement):
     """
 
     def compose(self) -> ComposeResult:
-        markdown = markdownify.markdownify(html=self.node.content)
-        tokens = markdown_parser.parse(src=markdown)
-        node = markdown_it.tree.SyntaxTreeNode(tokens=tokens)
+        node = html_to_tree(html=self.node.content, parser=markdown_parser)
+        if any(child.type == "heading" for child in node.walk()):
+            # the ids of headings are assigned per node. repeated fragments need their own nodes.
+            # their ids are registered once per html-block so that every re-compose gets the same ids
+            node = node.copy()
+            self.root.document.slugs.add_fragment(
+                self.node, [child for child in node.walk() if child.type == "heading"],
+            )
         yield from render_node(node=node, root=self.root)
 
 
+class MarkdownDiv(MarkdownElement):
+    DEFAULT_CSS = r"""
+    MarkdownDiv {
+        layout: vertical;
+    }
+    """
+
+    def compose(self) -> ComposeResult:
+        yield from render_node(node=self.node, root=self.root)
+
+
+class MarkdownDetails(MarkdownElement):
+    DEFAULT_CSS = r"""
+    MarkdownDetails {
+        layout: vertical;
+    }
+    MarkdownDetails > Collapsible {
+        padding-bottom: 0;
+    }
+    """
+
+    def compose(self) -> ComposeResult:
+        summary = next((child for child in self.node.children if child.type == "summary"), None)
+        content = [
+            create_element(node=child, root=self.root)
+            for child in self.node.children if child is not summary
+        ]
+        yield textual.widgets.Collapsible(
+            *content,
+            title=node_plaintext(summary.children[0]) if summary and summary.children else "Details",
+            collapsed=self.node.attrGet("open") is None,
+        )
+
+
 class MarkdownFrontMatter(MarkdownElement):
     DEFAULT_CSS = r"""
     MarkdownFrontMatter {
@@ -690,14 +887,21 @@ class MarkdownToc(MarkdownElement):
     """
 
     @functools.cached_property
-    def headings(self) -> t.Iterable[t.Tuple[int, MarkdownHeading]]:
+    def headings(self) -> t.List[Heading]:
+        r"""
+        taken from the parsed document so the toc doesn't depend on the mounted heading-widgets
+        """
         max_depth = self.node.attrGet("depth")
         max_depth = int(max_depth) if max_depth and max_depth.isdigit() else 3
-        for widget in self.root.walk_children(MarkdownHeading, method='depth'):
-            level = len(widget.node.markup)
-            if level > max_depth or widget.has_class("no_toc"):
-                continue
-            yield level, widget
+        return [
+            heading for heading in self.root.document.headings
+            if heading.level <= max_depth and "no_toc" not in heading.classes
+        ]
+
+    def refresh_headings(self) -> None:
+        for name in ('headings', '_rendered'):
+            self.__dict__.pop(name, None)
+        self.refresh(layout=True)
 
     @staticmethod
     def _bullet_list_icon(_) -> str:
@@ -718,7 +922,8 @@ class MarkdownToc(MarkdownElement):
             style=Style(bold=True, italic=True)
         )
         stack = []
-        for level, heading in self.headings:
+        for heading in self.headings:
+            level = heading.level
             while level > len(stack):
                 stack.append(0)
             while level < len(stack):
@@ -727,8 +932,8 @@ class MarkdownToc(MarkdownElement):
 
             text.append(text=f"{'  ' * level}{get_icon(stack[-1])} ")
             text.append(
-                text=heading.rendered_plaintext,
-                style=Style.from_meta({'@click': f"link({('#'+heading.id)!r})"})
+                text=heading.text,
+                style=Style.from_meta({'@click': f"link({('#'+heading.slug)!r})"})
             )
             text.append(text='\n')
         return text
@@ -758,7 +963,7 @@ class MarkdownFootnote(MarkdownElement):
     """
 
     def on_mount(self):
-        logging.debug(f"Footnote: {vars(self.node)}")
+        logging.debug(f"Footnote: {self.node.describe()}")
 
     def compose(self) -> ComposeResult:
         yield from render_node(node=self.node, root=self.root)
@@ -772,7 +977,7 @@ class MarkdownFootnoteAnchor(MarkdownFootnote):
     }
     """
 
-    def __init__(self, node: markdown_it.tree.SyntaxTreeNode, root: 'CustomMarkdown'):
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
         super().__init__(node=node, root=root)
         footnote_id = self.node.meta['id']
         self.id = f'footnote-{self.root.DOCUMENT_ID}-{footnote_id}'
@@ -781,12 +986,98 @@ class MarkdownFootnoteAnchor(MarkdownFootnote):
 class UnknownElement(MarkdownElement):
     def on_mount(self):
         logging.warning(f"Unknown node-type: {self.node.type}")
-        logging.debug(f"{vars(self.node)}")
+        logging.debug(f"{self.node.describe()}")
 
     def render(self) -> textual.app.RenderableType:
         return Text(f"{self.node}", style=Style.parse("on red"))
 
 
+class MarkdownFlatText(_MarkdownInlineText):
+    r"""
+    pure-text block that is rendered into a single widget (flat rendering mode)
+    """
+
+    @classmethod
+    def supports(cls, node: Node) -> bool:
+        raise NotImplementedError()
+
+    @staticmethod
+    def is_plain_paragraph(node: Node) -> bool:
+        if node.type != "paragraph" or len(node.children) != 1 or node.children[0].type != "inline":
+            return False  # e.g. footnote-anchors have to stay widgets
+        return not any(child.type == "image" for child in node.children[0].walk())
+
+    def render_block(self, node: Node) -> textual.app.RenderableType:
+        raise NotImplementedError()
+
+    @functools.cached_property
+    def rendered(self) -> textual.app.RenderableType:
+        return self.render_block(self.node)
+
+    def render(self) -> textual.app.RenderableType:
+        return self.rendered
+
+
+class MarkdownFlatParagraph(MarkdownFlatText):
+    @classmethod
+    def supports(cls, node: Node) -> bool:
+        return cls.is_plain_paragraph(node)
+
+    def render_block(self, node: Node) -> textual.app.RenderableType:
+        return self.render_inline(node.children[0])
+
+
+class MarkdownFlatBlockQuote(MarkdownFlatText):
+    DEFAULT_CSS = r"""
+    MarkdownFlatBlockQuote {
+        border-left: outer $primary;
+        background: $background-lighten-1;
+        padding: 1 1;
+    }
+    """
+
+    @classmethod
+    def supports(cls, node: Node) -> bool:
+        return all(cls.is_plain_paragraph(child) for child in node.children)
+
+    def render_block(self, node: Node) -> textual.app.RenderableType:
+        return Text('\n').join(self.render_inline(child.children[0]) for child in node.children)
+
+
+class MarkdownFlatList(MarkdownFlatText):
+    @classmethod
+    def supports(cls, node: Node) -> bool:
+        return all(
+            cls.is_plain_paragraph(child) or (child.type in {'bullet_list', 'ordered_list'} and cls.supports(child))
+            for item in node.children
+            for child in item.children
+        )
+
+    @staticmethod
+    def get_icon(node: Node, i: int) -> str:
+        if node.type == 'ordered_list':
+            return f"{i + 1}."
+        depth = 0
+        p = node.parent
+        while p:
+            if p.type == node.type:
+                depth += 1
+            p = p.parent
+        return BULLETS[depth % len(BULLETS)]
+
+    def render_block(self, node: Node) -> textual.app.RenderableType:
+        # same layout as the widgets: the icon in its own line and the indented content below
+        renderables = []
+        for i, item in enumerate(node.children):
+            renderables.append(Text(self.get_icon(node, i)))
+            content = [
+                self.render_inline(child.children[0]) if child.type == 'paragraph' else self.render_block(child)
+                for child in item.children
+            ]
+            renderables.append(rich.padding.Padding(rich.console.Group(*content), pad=(0, 0, 0, 2)))
+        return rich.console.Group(*renderables)
+
+
 HTML_MAP = dict(
     inline=MarkdownInline,
     hr=MarkdownHorizontalRule,
@@ -800,6 +1091,9 @@ HTML_MAP = dict(
     list_item=MarkdownListItem,
     blockquote=MarkdownBlockQuote,
     html_block=MarkdownHtmlBlock,
+    div=MarkdownDiv,
+    details=MarkdownDetails,
+    summary=MarkdownParagraph,
     # gfm-like
     table=MarkdownTable,
     thead=MarkdownTableHead,
@@ -816,10 +1110,76 @@ HTML_MAP = dict(
 )
 
 
-def render_node(node: markdown_it.tree.SyntaxTreeNode, root: 'CustomMarkdown'):
+FLAT_MAP = dict(
+    paragraph=MarkdownFlatParagraph,
+    blockquote=MarkdownFlatBlockQuote,
+    ordered_list=MarkdownFlatList,
+    bullet_list=MarkdownFlatList,
+)
+
+
+def create_element(node: Node, root: 'CustomMarkdown') -> MarkdownElement:
+    if root.flat:
+        flat_type = FLAT_MAP.get(node.type)
+        if flat_type is not None and flat_type.supports(node):
+            return flat_type(node=node, root=root)
+    if root.line_tables and MarkdownLineTable.supports(node):
+        return MarkdownLineTable(node=node, root=root)
+    node_type = HTML_MAP.get(node.type, UnknownElement)
+    return node_type(node=node, root=root)
+
+
+def render_node(node: Node, root: 'CustomMarkdown'):
     for node in node.children:
-        node_type = HTML_MAP.get(node.type, UnknownElement)
-        yield node_type(node=node, root=root)
+        yield create_element(node=node, root=root)
+
+
+class MarkdownBlock(textual.widget.Widget):
+    r"""
+    slot for a top-level block of a virtualized document.
+    it either contains the rendered element or only reserves its (estimated or measured) height
+    """
+
+    DEFAULT_CSS = r"""
+    MarkdownBlock {
+        height: auto;
+    }
+    """
+
+    def __init__(self, node: Node, root: 'CustomMarkdown'):
+        super().__init__()
+        self.node = node
+        self.root = root
+        self.element: t.Optional[MarkdownElement] = None
+        self.estimated_height = self.estimate_height(node)
+        self.styles.height = self.estimated_height
+
+    @staticmethod
+    def estimate_height(node: Node) -> int:
+        if node.map is None:
+            return 1
+        start, end = node.map
+        return max(1, end - start) + 1
+
+    @property
+    def is_materialized(self) -> bool:
+        return self.element is not None
+
+    async def materialize(self) -> None:
+        if self.element is not None:
+            return
+        self.element = create_element(node=self.node, root=self.root)
+        self.styles.height = None
+        await self.mount(self.element)
+
+    async def release(self) -> None:
+        if self.element is None:
+            return
+        if self.outer_size.height:
+            self.estimated_height = self.outer_size.height  # measured
+        self.styles.height = self.estimated_height
+        element, self.element = self.element, None
+        await element.remove()
 
 
 class CustomMarkdown(textual.widget.Widget):
@@ -832,13 +1192,49 @@ class CustomMarkdown(textual.widget.Widget):
     """
 
     DIR = Path.cwd()
-    TOKENS: t.List[markdown_it.token.Token] = None
-    ROOT_NODE: markdown_it.tree.SyntaxTreeNode = None
+    ROOT_NODE: Node = None
+    document: t.Optional[ParsedDocument] = None
     DOCUMENT_ID: str = random.randbytes(4).hex()
 
-    def __init__(self, file: Path = None):
+    # documents with more top-level blocks are virtualized if not explicitly configured
+    VIRTUALIZE_THRESHOLD = 200
+    # how many screen-heights above and below the viewport are mounted
+    OVERSCAN = 1.0
+    # seconds between checks for changes of the file (auto_reload)
+    RELOAD_INTERVAL = 0.5
+    # seconds per frame that are spent on mounting the blocks below the first screen
+    MOUNT_FRAME_BUDGET = 1 / 60
+
+    def __init__(
+            self,
+            file: Path = None,
+            *,
+            virtualize: t.Optional[bool] = None,
+            stream: t.Optional[bool] = None,
+            auto_reload: bool = False,
+            flat: bool = False,
+            line_tables: bool = False,
+    ):
         super().__init__()
         self.file = file
+        self.flat = flat
+        self.line_tables = line_tables
+        self.virtualize = virtualize
+        self.stream = stream
+        self.virtualized = False
+        self.auto_reload = auto_reload
+        self._viewport_update_pending = False
+        self._scroll_target: t.Optional[textual.widget.Widget] = None
+        self._loaded_key: t.Optional[tuple] = None
+        self._load_generation = 0
+        # a load() whose document didn't arrive yet. there is nothing to compare changes against until then
+        self._load_pending = False
+        # (block-key, widget) for every top-level block. only tracked with auto_reload
+        self._blocks: t.List[t.Tuple[str, textual.widget.Widget]] = []
+        # top-level blocks that are not mounted yet (progressive mounting)
+        self._pending: t.List[textual.widget.Widget] = []
+        # one InlineRenderer (with its interned styles) per set of component-styles of the current document
+        self._inline_renderers: t.Dict[ComponentStyles, InlineRenderer] = {}
 
     class LinkClicked(textual.widget.Message, bubble=True):
         def __init__(self, root: 'CustomMarkdown', href: str):
@@ -850,23 +1246,435 @@ class CustomMarkdown(textual.widget.Widget):
         def control(self) -> 'CustomMarkdown':
             return self.root
 
+    class DocumentChunk(textual.widget.Message, bubble=False):
+        r"""
+        next chunk of a streamed document. `chunk` is None once the whole file was parsed
+        """
+        def __init__(
+                self, file: Path, key: tuple, chunk: t.Optional[ParsedChunk],
+                generation: int, first: bool,
+        ):
+            super().__init__()
+            self.file = file
+            self.key = key
+            self.chunk = chunk
+            self.generation = generation
+            self.first = first
+
+    class DocumentLoaded(textual.widget.Message, bubble=False):
+        def __init__(self, file: Path, key: tuple, document: ParsedDocument, generation: int, patch: bool):
+            super().__init__()
+            self.file = file
+            self.key = key
+            self.document = document
+            self.generation = generation
+            self.patch = patch
+
     async def on_mount(self):
         if self.file:
             await self.load(self.file)
+            if self.auto_reload:
+                self.set_interval(self.RELOAD_INTERVAL, self.check_for_changes)
+
+    @staticmethod
+    def read(file: Path) -> t.Tuple[tuple, ParsedDocument]:
+        key = DOCUMENT_CACHE.key_for(file)
+        document = DOCUMENT_CACHE.get(key)
+        if document is None:
+            document = CustomMarkdown.parse(markdown=file.read_text(encoding='utf-8'))
+            DOCUMENT_CACHE.put(key, document, nbytes=document.root.estimate_size())
+        else:
+            logging.debug(f"Using cached document for {file} ({DOCUMENT_CACHE!r})")
+        return key, document
 
     async def load(self, file: Path):
-        await self.update(markdown=file.read_text(encoding='utf-8'), src_dir=file.parent)
+        r"""
+        reads and parses the file in a worker-thread. a newer call to load() cancels the previous one
+        """
+        self.file = file
+        self._load_generation += 1
+        self._load_pending = True
+        self._load_worker(file=file, generation=self._load_generation, patch=False)
+
+    async def check_for_changes(self):
+        if self._load_pending:
+            return  # the pending load reads the current version anyway
+        try:
+            key = DOCUMENT_CACHE.key_for(self.file)
+        except OSError:  # e.g. editors that replace the file on save
+            return
+        if key == self._loaded_key:
+            return
+        logging.debug(f"File {self.file} changed. Reloading")
+        self._loaded_key = key
+        self._load_generation += 1
+        self._load_worker(file=self.file, generation=self._load_generation, patch=True)
+
+    def should_stream(self, file: Path) -> bool:
+        if self.stream is None:
+            return file.stat().st_size >= stream.STREAM_THRESHOLD
+        return self.stream
+
+    @textual.work(thread=True, exclusive=True, exit_on_error=False, group="load")
+    def _load_worker(self, file: Path, generation: int, patch: bool):
+        worker = textual.worker.get_current_worker()
+        try:
+            if self.should_stream(file):
+                # streamed documents are always loaded from scratch
+                self._stream_document(file=file, generation=generation)
+                return
+            key, document = self.read(file)
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            logging.error(f"Failed to load {file}", exc_info=error)
+            if generation == self._load_generation:
+                self._load_pending = False  # checking for changes picks up the file once it's readable
+            self.notify(
+                message=f"{type(error).__name__}: {error}",
+                title="Failed to load document",
+                severity='error',
+                timeout=10,
+            )
+            return
+        if worker.is_cancelled:
+            logging.debug(f"Dropping outdated document {file}")
+            return
+        self.post_message(self.DocumentLoaded(
+            file=file, key=key, document=document, generation=generation, patch=patch
+        ))
+
+    def _stream_document(self, file: Path, generation: int):
+        r"""
+        parses the file chunk by chunk and builds its nodes (in the worker-thread). every chunk is handed to the widget
+        """
+        worker = textual.worker.get_current_worker()
+        key = DOCUMENT_CACHE.key_for(file)
+        first = True
+        for tokens in stream.parse_chunks(parser_backend, file):
+            if worker.is_cancelled:
+                logging.debug(f"Stopped streaming outdated document {file}")
+                return
+            chunk = ParsedChunk(tokens)
+            self.post_message(self.DocumentChunk(file=file, key=key, chunk=chunk, generation=generation, first=first))
+            first = False
+        self.post_message(self.DocumentChunk(file=file, key=key, chunk=None, generation=generation, first=first))
+
+    @textual.on(DocumentChunk)
+    async def on_document_chunk(self, event: DocumentChunk):
+        event.stop()
+        if event.generation != self._load_generation:
+            return
+        if event.first:
+            self._loaded_key = event.key
+            document = ParsedDocument([], complete=False)
+            if event.chunk is not None:
+                document.extend(event.chunk)
+            await self.set_document(document, src_dir=event.file.parent)
+        elif event.chunk is not None:
+            await self.append_document(event.chunk)
+        if event.chunk is None:
+            self._load_pending = False
+            self.document.complete = True
+            logging.debug(f"Streamed {len(self.document.root.children)} blocks of {event.file}")
+            # the table of contents only knew the headings of the chunks before
+            for toc in self.query(MarkdownToc):
+                toc.refresh_headings()
+
+    @textual.on(DocumentLoaded)
+    async def on_document_loaded(self, event: DocumentLoaded):
+        event.stop()
+        if event.generation != self._load_generation:
+            return  # a newer load was requested in the meantime
+        self._load_pending = False
+        self._loaded_key = event.key
+        if event.patch:
+            await self.patch_document(event.document)
+        else:
+            await self.set_document(event.document, src_dir=event.file.parent)
 
     async def update(self, markdown: str, src_dir: t.Union[str, Path] = None):
+        await self.set_document(self.parse(markdown=markdown), src_dir=src_dir)
+
+    @staticmethod
+    def parse(markdown: str) -> ParsedDocument:
+        tokens = TOKEN_CACHE.get(markdown)
+        if tokens is None:
+            tokens = parser_backend.parse(markdown)
+            TOKEN_CACHE.put(markdown, tokens)
+        return ParsedDocument(tokens)
+
+    def inline_renderer(self, widget: MarkdownElement) -> InlineRenderer:
+        # keyed by the styles themselves: widgets of the same type and style can still differ in their components
+        styles = ComponentStyles.of(widget, link_component=widget.INLINE_LINK_COMPONENT)
+        renderer = self._inline_renderers.get(styles)
+        if renderer is None:
+            renderer = self._inline_renderers[styles] = InlineRenderer(widget, styles, document_id=self.DOCUMENT_ID)
+        return renderer
+
+    def notify_style_update(self) -> None:
+        super().notify_style_update()
+        self._inline_renderers.clear()
+
+    async def set_document(self, document: ParsedDocument, src_dir: t.Union[str, Path] = None):
         self.DOCUMENT_ID = random.randbytes(4).hex()
+        self._inline_renderers.clear()
         logging.debug(f"Loading Markdown-Document with generated id {self.DOCUMENT_ID!r}")
         self.DIR = Path(src_dir) if src_dir else Path.cwd()
 
-        self.TOKENS = tokens = markdown_parser.parse(markdown)
-        self.ROOT_NODE = root_node = markdown_it.tree.SyntaxTreeNode(tokens, create_root=True)
+        self.document = document
+        self.ROOT_NODE = root_node = document.root
 
-        widgets = render_node(node=root_node, root=self)
+        self.virtualized = self.should_virtualize(document)
+        if self.virtualized:
+            logging.debug(f"Virtualizing document with {len(root_node.children)} blocks")
+        widgets = [self.create_block(node) for node in root_node.children]
+        self._blocks = (
+            list(zip(block_keys(root_node, document.slugs), widgets))
+            if self.auto_reload and document.complete else []
+        )
 
+        # the first screen is mounted (and painted) right away. the rest follows in chunks
+        self.workers.cancel_group(self, "mount")
+        first = self.first_screen(root_node.children)
+        self._pending = widgets[first:]
         with self.app.batch_update():
             await self.remove_children()
-            await self.mount_all(widgets)
+            await self.mount_all(widgets[:first])
+        if self._pending:
+            self._mount_pending(self._pending)
+
+        if self.virtualized:
+            container = self.scroll_container
+            if container is not None:
+                self.watch(container, "scroll_y", self.request_viewport_update, init=False)
+            self.call_after_refresh(self.request_viewport_update)
+
+    def first_screen(self, nodes: t.Sequence[Node]) -> int:
+        r"""
+        number of top-level blocks that (estimated) fill the first screen
+        """
+        container = self.scroll_container
+        viewport_height = (container.scrollable_content_region.height if container else 0) or self.app.size.height
+        height = 0
+        for index, node in enumerate(nodes):
+            height += MarkdownBlock.estimate_height(node)
+            if height > viewport_height:
+                return index + 1
+        return len(nodes)
+
+    @textual.work(exclusive=True, exit_on_error=False, group="mount")
+    async def _mount_pending(self, pending: t.List[textual.widget.Widget]):
+        chunk_size = 4
+        while pending:
+            start = time.perf_counter()
+            chunk = pending[:chunk_size]
+            del pending[:chunk_size]
+            with self.app.batch_update():
+                await self.mount_all(chunk)
+            elapsed = time.perf_counter() - start
+            # as many blocks as can be mounted within the budget of a frame. but every mount re-arranges
+            # all mounted blocks. so the chunks grow with the document to keep the number of layouts low
+            chunk_size = max(
+                int(chunk_size * self.MOUNT_FRAME_BUDGET / max(elapsed, 1e-4)),
+                len(self.children) // 2,
+                1,
+            )
+            if self.virtualized:
+                self.request_viewport_update()
+            # gives the app time to paint and to handle input
+            await asyncio.sleep(0)
+        logging.debug(f"Mounted all blocks of document {self.DOCUMENT_ID!r}")
+
+    async def mount_pending(self, until: int) -> None:
+        r"""
+        mounts the not yet mounted top-level blocks up to the index `until` immediately
+        """
+        count = until + 1 - len(self.children)
+        if count <= 0 or not self._pending:
+            return
+        chunk = self._pending[:count]
+        del self._pending[:count]
+        await self.mount_all(chunk)
+
+    async def append_document(self, chunk: ParsedChunk) -> None:
+        r"""
+        appends the next chunk of a streamed document. the blocks are mounted in the background
+        """
+        nodes = self.document.extend(chunk)
+        was_idle = not self._pending
+        self._pending.extend(self.create_block(node) for node in nodes)
+        if was_idle and self._pending:
+            self._mount_pending(self._pending)
+
+    def should_virtualize(self, document: ParsedDocument) -> bool:
+        if self.virtualize is None:
+            # streamed documents are large and still growing
+            return not document.complete or len(document.root.children) > self.VIRTUALIZE_THRESHOLD
+        return self.virtualize
+
+    def create_block(self, node: Node) -> textual.widget.Widget:
+        if self.virtualized:
+            return MarkdownBlock(node=node, root=self)
+        return create_element(node=node, root=self)
+
+    async def patch_document(self, document: ParsedDocument):
+        r"""
+        replaces only the top-level blocks that changed compared to the current document
+        """
+        root_node = document.root
+        if not self._blocks or self._pending or self.should_virtualize(document) != self.virtualized:
+            await self.set_document(document, src_dir=self.DIR)
+            return
+
+        # new elements have to use the data of the new document
+        self.document = document
+        self.ROOT_NODE = root_node
+
+        new_keys = block_keys(root_node, document.slugs)
+        opcodes = diff_blocks([key for key, _ in self._blocks], new_keys)
+        kept = {
+            id(widget)
+            for tag, i1, i2, _, _ in opcodes if tag == 'equal'
+            for _, widget in self._blocks[i1:i2]
+        }
+
+        blocks = []
+        removed = []
+        mounts = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                for (_, widget), node, key in zip(self._blocks[i1:i2], root_node.children[j1:j2], new_keys[j1:j2]):
+                    if isinstance(widget, MarkdownBlock):
+                        widget.node = node  # not yet rendered blocks have to use the new source-map
+                    blocks.append((key, widget))
+                continue
+            removed.extend(widget for _, widget in self._blocks[i1:i2])
+            widgets = [self.create_block(node) for node in root_node.children[j1:j2]]
+            before = next((widget for _, widget in self._blocks[i2:] if id(widget) in kept), None)
+            mounts.append((widgets, before))
+            blocks.extend(zip(new_keys[j1:j2], widgets))
+        logging.debug(f"Re-rendering {sum(len(widgets) for widgets, _ in mounts)} of {len(blocks)} blocks")
+
+        container = self.scroll_container
+        scroll_y = container.scroll_y if container is not None else None
+
+        self._blocks = blocks
+
+        with self.app.batch_update():
+            for widget in removed:
+                await widget.remove()
+            for widgets, before in mounts:
+                if not widgets:
+                    continue
+                if before is None:
+                    await self.mount_all(widgets)
+                else:
+                    await self.mount_all(widgets, before=before)
+
+        if scroll_y is not None:
+            self.call_after_refresh(container.scroll_to, y=scroll_y, animate=False)
+        if self.virtualized:
+            self.request_viewport_update()
+
+    async def reveal_anchor(self, anchor: str) -> t.Optional[textual.widget.Widget]:
+        r"""
+        widget with the id `anchor` (without #). the block is mounted first if the document is virtualized
+        """
+        key = anchor
+        footnote_prefix = f"footnote-{self.DOCUMENT_ID}-"
+        if anchor.startswith(footnote_prefix):
+            key = f"footnote-{anchor.removeprefix(footnote_prefix)}"
+        index = self.document.anchors.get(key) if self.document else None
+        if index is not None:
+            await self.mount_pending(until=index)
+        if index is None or index >= len(self.children):
+            # ids that are not part of the parsed tree (e.g. from html-blocks)
+            try:
+                return self.query_one(f"#{anchor}")
+            except textual.app.NoMatches:
+                return None
+        block = self.children[index]
+        if isinstance(block, MarkdownBlock):
+            # keeps the block mounted until it was scrolled to
+            self._scroll_target = block
+            await block.materialize()
+        if block.id == anchor:
+            return block
+        try:
+            return block.query_one(f"#{anchor}")
+        except textual.app.NoMatches:
+            return None
+
+    def scroll_to_element(self, widget: textual.widget.Widget) -> None:
+        container = self.scroll_container
+        if container is None:
+            return
+        if self.virtualized:
+            # blocks around the target are mounted after scrolling and can move it. so it's centered again afterwards
+            self._scroll_target = widget
+        # the widget might just have been mounted and needs to be arranged first
+        self.call_after_refresh(container.scroll_to_center, widget, animate=not self.virtualized)
+
+    def is_scroll_target(self, block: 'MarkdownBlock') -> bool:
+        target = self._scroll_target
+        return target is not None and target.is_attached and block in target.ancestors_with_self
+
+    @property
+    def scroll_container(self) -> t.Optional[textual.widget.Widget]:
+        for node in self.ancestors:
+            if isinstance(node, textual.widget.Widget) and node.styles.overflow_y in {'auto', 'scroll'}:
+                return node
+        return None
+
+    def on_resize(self) -> None:
+        if self.virtualized:
+            self.request_viewport_update()
+
+    def request_viewport_update(self) -> None:
+        if self._viewport_update_pending:
+            return
+        self._viewport_update_pending = True
+        self.call_after_refresh(self.update_viewport)
+
+    async def update_viewport(self) -> None:
+        r"""
+        mounts the blocks near the viewport and releases the ones far away from it
+        """
+        self._viewport_update_pending = False
+        container = self.scroll_container
+        if not self.virtualized or container is None or not self.is_attached:
+            return
+        viewport_height = container.scrollable_content_region.height or self.app.size.height
+        # document-offset within the scrollable area of the container
+        offset = self.region.y - container.scrollable_content_region.y + round(container.scroll_y)
+        overscan = round(viewport_height * self.OVERSCAN)
+        top = container.scroll_y - offset - overscan
+        bottom = container.scroll_y - offset + viewport_height + overscan
+
+        changed = False
+        y = 0
+        with self.app.batch_update():
+            for block in self.children:
+                if not isinstance(block, MarkdownBlock):
+                    continue
+                height = block.outer_size.height or block.estimated_height
+                if y + height >= top and y <= bottom:
+                    if not block.is_materialized:
+                        await block.materialize()
+                        changed = True
+                elif y + height < top - overscan or y > bottom + overscan:
+                    if block.is_materialized and not self.is_scroll_target(block):
+                        await block.release()
+                        changed = True
+                y += height
+        if changed:
+            # heights of the materialized blocks changed. check again once they are measured
+            self.request_viewport_update()
+        elif self._scroll_target is not None:
+            target = self._scroll_target
+            if target.is_attached and not target.outer_size.height:
+                # not arranged yet
+                self.request_viewport_update()
+                return
+            self._scroll_target = None
+            if target.is_attached:
+                container.scroll_to_center(target, animate=False)
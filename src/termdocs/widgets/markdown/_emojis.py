@@ -179,8 +179,10 @@ EMOJIS = {
   "point_up": "☝️",
   "+1": "👍",
   "thumbsup": "👍",
+  "thumbs_up": "👍",
   "-1": "👎",
   "thumbsdown": "👎",
+  "thumbs_down": "👎",
   "fist_raised": "✊",
   "fist": "✊",
   "fist_oncoming": "👊",
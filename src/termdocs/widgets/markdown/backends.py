@@ -0,0 +1,347 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+parser-backends. the pure-python markdown-it (with all plugins) is always available.
+if markdown-it-pyrs (compiled) is installed, it parses the documents that don't need the plugins
+and its tree is converted into the same token-stream (and so the same SyntaxTreeNode-shape)
+"""
+import re
+import bisect
+import logging
+import typing as t
+import markdown_it
+from markdown_it.token import Token
+from markdown_it.rules_core import StateCore
+try:
+    import markdown_it_pyrs
+except ImportError:
+    markdown_it_pyrs = None
+
+
+ORDERED_MARKER_RE = re.compile(rb"[ \t>]*(\d+)")
+
+
+class UnsupportedDocument(ValueError):
+    r"""
+    the document needs something (plugin-syntax, node-type) that the backend doesn't support
+    """
+
+
+class ParserBackend:
+    name: str = "abstract"
+
+    def __init__(self, parser: markdown_it.MarkdownIt):
+        # the configured python-parser. also used by the other backends for the post-processing
+        self.parser = parser
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name!r}>"
+
+    def parse(self, markdown: str, env: t.Optional[dict] = None) -> t.List[Token]:
+        raise NotImplementedError()
+
+
+class PythonBackend(ParserBackend):
+    name = "markdown-it-py"
+
+    def parse(self, markdown: str, env: t.Optional[dict] = None) -> t.List[Token]:
+        return self.parser.parse(markdown, env)
+
+
+class TreeConverter:
+    r"""
+    converts the tree of markdown-it-pyrs into the token-stream of markdown-it-py
+    """
+
+    # inline nodes with an _open and _close token: type -> (tag, markup-factor)
+    PAIRED = {'em': ('em', 1), 'strong': ('strong', 2), 'strikethrough': ('s', 2)}
+    INLINE = frozenset({
+        'text', 'text_special', 'softbreak', 'hardbreak', 'em', 'strong', 'strikethrough', 'code_inline',
+        'link', 'image', 'autolink', 'html_inline',
+    })
+
+    def __init__(self, markdown: str):
+        self.source = markdown.encode('utf-8', errors='surrogatepass')
+        self.line_starts = [0]
+        self.line_starts.extend(match.end() for match in re.finditer(b"\n", self.source))
+        self.tokens: t.List[Token] = []
+
+    def convert(self, root: t.Any) -> t.List[Token]:
+        for node in root.children:
+            self.block(node, level=0, quote_depth=0)
+        return self.tokens
+
+    def line_map(self, node) -> t.List[int]:
+        start, end = node.srcmap
+        return [
+            bisect.bisect_right(self.line_starts, start) - 1,
+            bisect.bisect_right(self.line_starts, max(start, end - 1)),
+        ]
+
+    def source_of(self, start: int, end: int) -> str:
+        return self.source[start:end].decode('utf-8', errors='surrogatepass')
+
+    def inline_source(self, children, quote_depth: int) -> str:
+        r"""
+        approximation of the (container-prefix free) source of the inline content
+        """
+        spans = [child.srcmap for child in children if child.srcmap]
+        if not spans:
+            return ""
+        lines = self.source_of(spans[0][0], spans[-1][1]).split('\n')
+        for index in range(1, len(lines)):
+            line = lines[index]
+            for _ in range(quote_depth):
+                line = line.lstrip(' ')
+                if line.startswith('>'):
+                    line = line[2:] if line.startswith('> ') else line[1:]
+            lines[index] = line.lstrip(' \t')
+        return '\n'.join(lines)
+
+    def push(self, type_: str, tag: str, nesting: int, level: int, **kwargs) -> Token:
+        token = Token(type_, tag, nesting, level=level, block=True, **kwargs)
+        self.tokens.append(token)
+        return token
+
+    def inline(self, node, children, level: int, quote_depth: int) -> None:
+        self.push(
+            'inline', '', 0, level, map=self.line_map(node),
+            content=self.inline_source(children, quote_depth).strip(),
+            children=self.inline_children(children),
+        )
+
+    def paragraph(self, node, children, level: int, quote_depth: int, hidden: bool = False) -> None:
+        self.push('paragraph_open', 'p', 1, level, map=self.line_map(node), hidden=hidden)
+        self.inline(node, children, level + 1, quote_depth)
+        self.push('paragraph_close', 'p', -1, level, hidden=hidden)
+
+    def block(self, node, level: int, quote_depth: int) -> None:
+        name = node.name
+        meta = node.meta
+        if name == 'paragraph':
+            self.paragraph(node, node.children, level, quote_depth)
+        elif name in ('heading', 'lheading'):
+            tag = f"h{meta['level']}"
+            markup = '#' * meta['level'] if name == 'heading' else meta['marker']
+            self.push('heading_open', tag, 1, level, map=self.line_map(node), markup=markup)
+            self.inline(node, node.children, level + 1, quote_depth)
+            self.push('heading_close', tag, -1, level, markup=markup)
+        elif name == 'blockquote':
+            self.push('blockquote_open', 'blockquote', 1, level, map=self.line_map(node), markup='>')
+            for child in node.children:
+                self.block(child, level + 1, quote_depth + 1)
+            self.push('blockquote_close', 'blockquote', -1, level, markup='>')
+        elif name in ('bullet_list', 'ordered_list'):
+            self.list(node, level, quote_depth)
+        elif name == 'fence':
+            self.push(
+                'fence', 'code', 0, level, map=self.line_map(node), content=meta['content'],
+                info=meta['info'], markup=meta['marker'] * meta['marker_len'],
+            )
+        elif name == 'code_block':
+            self.push('code_block', 'code', 0, level, map=self.line_map(node), content=meta['content'])
+        elif name == 'hr':
+            # markdown-it-py repeats the marker once more than it was counted
+            self.push('hr', 'hr', 0, level, map=self.line_map(node), markup=meta['marker'] * (meta['marker_len'] + 1))
+        elif name == 'html_block':
+            self.push('html_block', '', 0, level, map=self.line_map(node), content=meta['content'])
+        elif name == 'table':
+            self.table(node, level, quote_depth)
+        elif name == 'definition':
+            pass  # link-reference definitions are only used while parsing
+        elif name == 'front_matter':
+            self.push(
+                'front_matter', '', 0, level, map=self.line_map(node), content=meta['content'].rstrip('\n'),
+                markup='---', hidden=True,
+            )
+        else:
+            raise UnsupportedDocument(f"block-node {name!r}")
+
+    def list(self, node, level: int, quote_depth: int) -> None:
+        ordered = node.name == 'ordered_list'
+        tag = 'ol' if ordered else 'ul'
+        marker = node.meta['marker']
+        start = node.meta.get('start', 1)
+        opener = self.push(f"{node.name}_open", tag, 1, level, map=self.line_map(node), markup=marker)
+        if ordered and start != 1:
+            opener.attrs['start'] = start
+        for index, item in enumerate(node.children):
+            if item.name != 'list_item':
+                raise UnsupportedDocument(f"list-child {item.name!r}")
+            number = ORDERED_MARKER_RE.match(self.source, item.srcmap[0]) if ordered else None
+            self.push(
+                'list_item_open', 'li', 1, level + 1, map=self.line_map(item), markup=marker,
+                info=number.group(1).decode() if number else '',
+            )
+            # tight lists have their inline content directly in the item (paragraphs are hidden in markdown-it-py)
+            run: t.List[t.Any] = []
+            for child in item.children:
+                if child.name in self.INLINE:
+                    run.append(child)
+                    continue
+                if run:
+                    self.hidden_paragraph(run, level + 2, quote_depth)
+                    run = []
+                self.block(child, level + 2, quote_depth)
+            if run:
+                self.hidden_paragraph(run, level + 2, quote_depth)
+            self.push('list_item_close', 'li', -1, level + 1, markup=marker)
+        self.push(f"{node.name}_close", tag, -1, level, markup=marker)
+
+    def hidden_paragraph(self, children, level: int, quote_depth: int) -> None:
+        span = _Span(children[0].srcmap[0], children[-1].srcmap[1])
+        self.paragraph(span, children, level, quote_depth, hidden=True)
+
+    def table(self, node, level: int, quote_depth: int) -> None:
+        alignments = node.meta.get('alignments', [])
+        self.push('table_open', 'table', 1, level, map=self.line_map(node))
+        for section in node.children:
+            if section.name not in ('thead', 'tbody'):
+                raise UnsupportedDocument(f"table-child {section.name!r}")
+            cell_tag = 'th' if section.name == 'thead' else 'td'
+            self.push(f"{section.name}_open", section.name, 1, level + 1, map=self.line_map(section))
+            for row in section.children:
+                self.push('tr_open', 'tr', 1, level + 2, map=self.line_map(row))
+                for index, cell in enumerate(row.children):
+                    opener = self.push(f"{cell_tag}_open", cell_tag, 1, level + 3)
+                    alignment = alignments[index] if index < len(alignments) else None
+                    if alignment in ('left', 'right', 'center'):
+                        opener.attrs['style'] = f"text-align:{alignment}"
+                    # the source-map of the inline content is the one of the row
+                    self.push(
+                        'inline', '', 0, level + 4, map=self.line_map(row),
+                        content=self.inline_source(cell.children, quote_depth).strip(),
+                        children=self.inline_children(cell.children),
+                    )
+                    self.push(f"{cell_tag}_close", cell_tag, -1, level + 3)
+                self.push('tr_close', 'tr', -1, level + 2)
+            self.push(f"{section.name}_close", section.name, -1, level + 1)
+        self.push('table_close', 'table', -1, level)
+
+    def inline_children(self, nodes, level: int = 0) -> t.List[Token]:
+        tokens: t.List[Token] = []
+        for node in nodes:
+            name = node.name
+            meta = node.meta
+            if name in ('text', 'text_special'):
+                tokens.append(Token(
+                    name, '', 0, level=level, content=meta.get('content', ''),
+                    markup=meta.get('markup', ''), info=meta.get('info', ''),
+                ))
+            elif name in ('softbreak', 'hardbreak'):
+                tokens.append(Token(name, 'br', 0, level=level))
+            elif name in self.PAIRED:
+                tag, factor = self.PAIRED[name]
+                markup = meta['marker'] * factor
+                tokens.append(Token(f"{tag}_open", tag, 1, level=level, markup=markup))
+                tokens.extend(self.inline_children(node.children, level + 1))
+                tokens.append(Token(f"{tag}_close", tag, -1, level=level, markup=markup))
+            elif name == 'code_inline':
+                tokens.append(Token(
+                    'code_inline', 'code', 0, level=level, markup=meta['marker'] * meta['marker_len'],
+                    content=''.join(child.meta.get('content', '') for child in node.children),
+                ))
+            elif name in ('link', 'autolink'):
+                opener = Token('link_open', 'a', 1, level=level)
+                opener.attrs['href'] = meta['url']
+                if meta.get('title'):
+                    opener.attrs['title'] = meta['title']
+                if name == 'autolink':
+                    opener.markup, opener.info = 'autolink', 'auto'
+                    children = [Token('text', '', 0, level=level + 1, content=child.meta.get('content', ''))
+                                for child in node.children]
+                else:
+                    children = self.inline_children(node.children, level + 1)
+                tokens.append(opener)
+                tokens.extend(children)
+                tokens.append(Token('link_close', 'a', -1, level=level, markup=opener.markup, info=opener.info))
+            elif name == 'image':
+                image = Token('image', 'img', 0, level=level, children=self.inline_children(node.children))
+                image.attrs['src'] = meta['url']
+                image.attrs['alt'] = ''
+                if meta.get('title'):
+                    image.attrs['title'] = meta['title']
+                image.content = self.inline_source(node.children, quote_depth=0)
+                tokens.append(image)
+            elif name == 'html_inline':
+                tokens.append(Token('html_inline', '', 0, level=level, content=meta['content']))
+            else:
+                raise UnsupportedDocument(f"inline-node {name!r}")
+        return tokens
+
+
+class _Span(t.NamedTuple):
+    start: int
+    end: int
+
+    @property
+    def srcmap(self) -> t.Tuple[int, int]:
+        return self.start, self.end
+
+
+class CompiledBackend(ParserBackend):
+    r"""
+    markdown-it-pyrs (rust). documents with the syntax of the python-only plugins raise UnsupportedDocument
+    """
+
+    name = "markdown-it-pyrs"
+    # emoji-shortcodes, attributes ({: .class } lines or after links, images and code), {:toc}, [[TOC]], footnotes
+    PLUGIN_SYNTAX_RE = re.compile(
+        r":[a-zA-Z0-9_+\-]+:|[)`\]]\{|^[ \t]*\{.*\}[ \t]*$|^[ \t]*\[\[TOC\]\]|\[\^",
+        re.MULTILINE,
+    )
+    # core-rules of the python-parser that run over the converted tokens
+    POST_RULES = ('linkify', 'text_join', 'html')
+
+    def __init__(self, parser: markdown_it.MarkdownIt):
+        super().__init__(parser)
+        if markdown_it_pyrs is None:
+            raise ImportError("markdown-it-pyrs is not installed")
+        self.name = f"{self.name} {markdown_it_pyrs.__version__}"
+        # linkify is done by the python core-rule so that the same links are found
+        self.compiled = markdown_it_pyrs.MarkdownIt("commonmark").enable_many(
+            ["table", "strikethrough", "front_matter"]
+        )
+        self.post_rules = [
+            rule.fn for rule in parser.core.ruler.__rules__
+            if rule.name in self.POST_RULES and rule.enabled
+        ]
+
+    def parse(self, markdown: str, env: t.Optional[dict] = None) -> t.List[Token]:
+        if env and any(env.values()):
+            raise UnsupportedDocument("shared environment (e.g. link-references of other chunks)")
+        match = self.PLUGIN_SYNTAX_RE.search(markdown)
+        if match:
+            raise UnsupportedDocument(f"plugin-syntax {match.group()!r}")
+        tokens = TreeConverter(markdown).convert(self.compiled.tree(markdown))
+        state = StateCore(markdown, self.parser, {} if env is None else env)
+        state.tokens = tokens
+        for rule in self.post_rules:
+            rule(state)
+        return state.tokens
+
+
+class FallbackBackend(ParserBackend):
+    r"""
+    tries the backends in order. the last one has to support every document
+    """
+
+    def __init__(self, parser: markdown_it.MarkdownIt, backends: t.Sequence[ParserBackend]):
+        super().__init__(parser)
+        self.backends = list(backends)
+        self.name = " > ".join(backend.name for backend in self.backends)
+
+    def parse(self, markdown: str, env: t.Optional[dict] = None) -> t.List[Token]:
+        for backend in self.backends[:-1]:
+            try:
+                return backend.parse(markdown, env)
+            except UnsupportedDocument as reason:
+                logging.debug(f"{backend.name} can't parse the document ({reason}). falling back")
+        return self.backends[-1].parse(markdown, env)
+
+
+def create_backend(parser: markdown_it.MarkdownIt, compiled: bool = True) -> ParserBackend:
+    python = PythonBackend(parser)
+    if compiled and markdown_it_pyrs is not None:
+        return FallbackBackend(parser, [CompiledBackend(parser), python])
+    return python
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+caches for parsed markdown-documents
+"""
+import os
+import sys
+import json
+import types
+import marshal
+import hashlib
+import logging
+import typing as t
+from pathlib import Path
+import markdown_it
+import markdown_it.token
+import mdit_py_plugins
+from util.lru import LRUCache
+
+
+T = t.TypeVar('T')
+CacheKey = t.Tuple[str, int, int]
+
+# increase if the format of the serialized tokens changes
+CACHE_FORMAT_VERSION = 1
+
+
+class DocumentCache(LRUCache[CacheKey, T]):
+    r"""
+    in-process LRU-cache for parsed documents
+
+    entries are keyed by (path, st_mtime_ns, st_size) so a changed file is never served from the cache
+    and the cache is bound by the number of entries and the estimated size in bytes.
+    the cache is thread-safe as documents are loaded in worker-threads
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+
+    @staticmethod
+    def key_for(path: t.Union[str, Path]) -> CacheKey:
+        path = Path(path).absolute()
+        stat = path.stat()
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    def put(self, key: CacheKey, value: T, nbytes: int) -> None:
+        with self._lock:
+            # older versions of the same file can't be hit anymore
+            for old_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self.discard(old_key)
+            super().put(key, value, nbytes)
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "termdocs" / "tokens"
+
+
+def parser_fingerprint(
+        parser: markdown_it.MarkdownIt, *modules: t.Union[types.ModuleType, Path], backend: str = "",
+) -> str:
+    r"""
+    hash over everything that influences the generated tokens
+    (parser-config, active rules, library-versions, the used parser-backend and the source of the given plugin-modules.
+    modules that are imported lazily can be given by their path)
+    """
+    fingerprint = hashlib.sha256()
+    fingerprint.update(f"{CACHE_FORMAT_VERSION}|{sys.version}|{marshal.version}".encode())
+    fingerprint.update(f"{markdown_it.__version__}|{mdit_py_plugins.__version__}|{backend}".encode())
+    fingerprint.update(json.dumps(
+        dict(parser.options), sort_keys=True, default=lambda obj: getattr(obj, '__qualname__', type(obj).__name__)
+    ).encode())
+    fingerprint.update(json.dumps(parser.get_active_rules(), sort_keys=True).encode())
+    for module in modules:
+        fingerprint.update(Path(getattr(module, '__file__', module)).read_bytes())
+    return fingerprint.hexdigest()
+
+
+def _dump_token(token: markdown_it.token.Token) -> tuple:
+    return (
+        token.type, token.tag, token.nesting, token.attrs or None, token.map, token.level,
+        None if token.children is None else [_dump_token(child) for child in token.children],
+        token.content, token.markup, token.info, token.meta or None, token.block, token.hidden,
+    )
+
+
+def _load_token(dumped: tuple) -> markdown_it.token.Token:
+    type_, tag, nesting, attrs, map_, level, children, content, markup, info, meta, block, hidden = dumped
+    return markdown_it.token.Token(
+        type_, tag, nesting, attrs or {}, map_, level,
+        None if children is None else [_load_token(child) for child in children],
+        content, markup, info, meta or {}, block, hidden,
+    )
+
+
+class TokenDiskCache:
+    r"""
+    persistent cache of markdown_it token-streams in the XDG cache directory
+
+    files are named after the hash of the parser-fingerprint and the markdown-content.
+    if the fingerprint changes (e.g. plugins.py was edited) all existing entries are dropped.
+    the directory is bound by max_bytes and evicts the least recently used files (by mtime)
+
+    note: entries are stored with `marshal` (fast but python-version specific, which is part of the fingerprint)
+    """
+
+    VERSION_FILE = "FINGERPRINT"
+    SUFFIX = ".tokens"
+
+    def __init__(
+            self,
+            directory: t.Union[str, Path],
+            fingerprint: str,
+            max_bytes: int = 64 * 1024 * 1024,
+            min_size: int = 8 * 1024,
+    ):
+        self.directory = Path(directory)
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.min_size = min_size  # smaller documents are faster to parse than to load
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._prepared = False
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {str(self.directory)!r} hits={self.hits} misses={self.misses}>"
+
+    def _prepare(self) -> bool:
+        if self._prepared:
+            return True
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            version_file = self.directory / self.VERSION_FILE
+            if not version_file.is_file() or version_file.read_text() != self.fingerprint:
+                logging.debug(f"Parser changed. Invalidating token-cache {str(self.directory)!r}")
+                self.clear()
+                version_file.write_text(self.fingerprint)
+        except OSError as error:
+            logging.error("Failed to prepare token-cache. Disabling it", exc_info=error)
+            self.enabled = False
+            return False
+        self._prepared = True
+        return True
+
+    def _path_for(self, markdown: str) -> Path:
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(markdown.encode('utf-8', errors='surrogatepass'))
+        return self.directory / f"{digest.hexdigest()}{self.SUFFIX}"
+
+    def _should_cache(self, markdown: str) -> bool:
+        return self.enabled and len(markdown) >= self.min_size and self._prepare()
+
+    def get(self, markdown: str) -> t.Optional[t.List[markdown_it.token.Token]]:
+        if not self._should_cache(markdown):
+            return None
+        path = self._path_for(markdown)
+        try:
+            dumped = marshal.loads(path.read_bytes())
+            tokens = [_load_token(token) for token in dumped]
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as error:  # broken or incompatible entry
+            logging.warning(f"Dropping invalid token-cache entry {path.name}: {error!r}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return tokens
+
+    def put(self, markdown: str, tokens: t.List[markdown_it.token.Token]) -> None:
+        if not self._should_cache(markdown):
+            return
+        path = self._path_for(markdown)
+        temp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            temp.write_bytes(marshal.dumps([_dump_token(token) for token in tokens]))
+            os.replace(temp, path)
+        except (OSError, ValueError) as error:  # ValueError: unmarshallable meta-data
+            logging.warning(f"Failed to write token-cache entry: {error!r}")
+            temp.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
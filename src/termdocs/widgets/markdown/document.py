@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+parsed markdown-document and the data that is derived once from its token-stream
+"""
+import re
+import difflib
+import typing as t
+from collections import Counter
+import markdown_it.token
+from .nodes import Node
+
+
+SLUG_INVALID_RE = re.compile(r"[^a-z0-9_\-]")
+
+
+def node_plaintext(node: Node) -> str:
+    text = []
+    for child in node.children:
+        if child.type == "text":
+            text.append(child.content)
+        elif child.children:
+            text.append(node_plaintext(node=child))
+    return ''.join(text)
+
+
+def slugify(text: str) -> str:
+    r"""
+    github-like slug that is also a valid identifier: '[a-zA-Z_\-][a-zA-Z0-9_\-]*'
+    """
+    slug = SLUG_INVALID_RE.sub('', text.strip().lower().replace(' ', '-'))
+    if not slug or slug[0].isdigit():
+        slug = f"_{slug}"
+    return slug
+
+
+class Heading(t.NamedTuple):
+    level: int
+    slug: str
+    text: str
+    classes: t.FrozenSet[str]
+
+
+class SlugRegistry:
+    r"""
+    assigns unique ids to the headings of one document.
+    duplicates get a counter appended like on GitHub ('returns', 'returns-1', 'returns-2', ...)
+    """
+
+    def __init__(self):
+        self._used: t.Set[str] = set()
+        self._counters: t.Dict[str, int] = {}
+        self._by_node: t.Dict[Node, str] = {}
+        # headings of fragments that are converted when they are rendered (see add_fragment())
+        self._by_fragment: t.Dict[t.Tuple[Node, int], str] = {}
+        self._fragments: t.Dict[Node, t.List[Node]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_node)
+
+    @classmethod
+    def from_tree(cls, root: Node) -> 'SlugRegistry':
+        registry = cls()
+        registry.add_headings([node for node in root.walk() if node.type == "heading"])
+        return registry
+
+    def add_headings(self, headings: t.Sequence[Node]) -> None:
+        # explicit ids ({: #custom-id }) are reserved first so generated slugs don't collide with them
+        for node in headings:
+            explicit = node.attrGet("id")
+            if explicit:
+                self._used.add(str(explicit))
+                self._by_node[node] = str(explicit)
+        for node in headings:
+            if node not in self._by_node:
+                self._by_node[node] = self.register(slugify(node_plaintext(node)))
+
+    def add_fragment(self, owner: Node, headings: t.Sequence[Node]) -> None:
+        r"""
+        ids for the headings of a fragment that is converted when it's rendered (e.g. an html-block).
+        every conversion creates new nodes. so the ids are keyed by (owner, index) and stay the same
+        """
+        for node in self._fragments.pop(owner, ()):
+            self._by_node.pop(node, None)
+        for index, node in enumerate(headings):
+            slug = self._by_fragment.get((owner, index))
+            if slug is None:
+                explicit = node.attrGet("id")
+                slug = str(explicit) if explicit else self.register(slugify(node_plaintext(node)))
+                self._by_fragment[(owner, index)] = slug
+            self._by_node[node] = slug
+        self._fragments[owner] = list(headings)
+
+    def register(self, base: str) -> str:
+        counter = self._counters.get(base, 0)
+        slug = base if counter == 0 else f"{base}-{counter}"
+        while slug in self._used:
+            counter += 1
+            slug = f"{base}-{counter}"
+        self._counters[base] = counter + 1
+        self._used.add(slug)
+        return slug
+
+    def get(self, node: Node) -> t.Optional[str]:
+        return self._by_node.get(node)
+
+    def id_for(self, node: Node) -> str:
+        r"""
+        id of a heading. headings that weren't part of the parsed tree (e.g. from html-blocks) are registered now
+        """
+        slug = self._by_node.get(node)
+        if slug is None:
+            slug = self._by_node[node] = self.register(slugify(node_plaintext(node)))
+        return slug
+
+
+# (index of the top-level block, node)
+ScrollTarget = t.Tuple[int, Node]
+
+
+def scroll_targets(blocks: t.Sequence[Node]) -> t.List[ScrollTarget]:
+    r"""
+    headings, footnote-anchors and nodes with an explicit id of the blocks
+    """
+    return [
+        (i, node)
+        for i, block in enumerate(blocks)
+        for node in block.walk()
+        if node.type in ("heading", "footnote_anchor") or node.attrGet("id")
+    ]
+
+
+class AnchorIndex:
+    r"""
+    all scroll-targets (heading-slugs, explicit ids, footnotes) of a document and the top-level block they are in.
+    similar ids are found with an index of trigrams instead of comparing against every id
+    """
+
+    NGRAM = 3
+    # number of candidates (by shared trigrams) that are compared in detail
+    CANDIDATES = 8
+
+    def __init__(self):
+        self._blocks: t.Dict[str, int] = {}
+        self._ngrams: t.Dict[str, t.List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, anchor: str) -> bool:
+        return anchor in self._blocks
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self._blocks)
+
+    @classmethod
+    def ngrams(cls, text: str) -> t.Set[str]:
+        padded = f"^{text}$"
+        return {padded[i:i + cls.NGRAM] for i in range(max(1, len(padded) - cls.NGRAM + 1))}
+
+    @classmethod
+    def from_tree(cls, root: Node, slugs: SlugRegistry) -> 'AnchorIndex':
+        index = cls()
+        index.add_blocks(root.children, slugs)
+        return index
+
+    def add_blocks(self, blocks: t.Sequence[Node], slugs: SlugRegistry, start: int = 0) -> None:
+        self.add_targets(scroll_targets(blocks), slugs, start=start)
+
+    def add_targets(self, targets: t.Sequence[ScrollTarget], slugs: SlugRegistry, start: int = 0) -> None:
+        for i, node in targets:
+            if node.type == "heading":
+                self.add(slugs.id_for(node), start + i)
+            elif node.type == "footnote_anchor":
+                # the id of the widget also contains the DOCUMENT_ID of the widget
+                self.add(f"footnote-{node.meta['id']}", start + i, fuzzy=False)
+            else:
+                self.add(str(node.attrGet("id")), start + i)
+
+    def add(self, anchor: str, block: int, fuzzy: bool = True) -> None:
+        if anchor in self._blocks:
+            return
+        self._blocks[anchor] = block
+        if fuzzy:
+            for gram in self.ngrams(anchor):
+                self._ngrams.setdefault(gram, []).append(anchor)
+
+    def get(self, anchor: str) -> t.Optional[int]:
+        return self._blocks.get(anchor)
+
+    def closest(self, anchor: str, cutoff: float = 0.6) -> t.Optional[str]:
+        r"""
+        most similar anchor (like difflib.get_close_matches but only for the candidates with the most shared trigrams)
+        """
+        postings = sorted(
+            (self._ngrams[gram] for gram in self.ngrams(anchor) if gram in self._ngrams),
+            key=len,
+        )
+        # trigrams that nearly every anchor has (e.g. 'ion') don't help to find candidates
+        common = max(64, len(self._blocks) // 10)
+        shared: t.Counter[str] = Counter()
+        for i, posting in enumerate(postings):
+            if i and len(posting) > common:
+                break
+            shared.update(posting)
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(anchor)
+        best, best_score = None, cutoff
+        for candidate, _ in shared.most_common(self.CANDIDATES):
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+
+class ParsedChunk:
+    r"""
+    top-level blocks of the next chunk of a streamed document (see ParsedDocument.extend()).
+    built in the worker-thread. so the event-loop only has to register the scroll-targets
+    """
+
+    __slots__ = ('blocks', 'targets')
+
+    def __init__(self, tokens: t.List[markdown_it.token.Token]):
+        self.blocks = Node.from_tokens(tokens).children
+        self.targets = scroll_targets(self.blocks)
+
+
+class ParsedDocument:
+    r"""
+    syntax-tree of a document together with the data derived from it.
+    only the compact tree is kept. the token-stream isn't referenced after the tree was built.
+    documents that are parsed in chunks (see stream.py) start incomplete and grow with extend()
+    """
+
+    __slots__ = ('root', 'slugs', 'anchors', 'headings', 'complete')
+
+    def __init__(self, tokens: t.List[markdown_it.token.Token], complete: bool = True):
+        self.complete = complete
+        self.root = Node.from_tokens(tokens)
+        self.slugs = SlugRegistry()
+        self.anchors = AnchorIndex()
+        self.headings: t.List[Heading] = []
+        self._index(scroll_targets(self.root.children), start=0)
+
+    def extend(self, chunk: ParsedChunk) -> t.List[Node]:
+        r"""
+        appends the top-level blocks of the next chunk and returns them
+        """
+        start = len(self.root.children)
+        for block in chunk.blocks:
+            block.parent = self.root
+        self.root.children.extend(chunk.blocks)
+        self._index(chunk.targets, start=start)
+        return chunk.blocks
+
+    def _index(self, targets: t.Sequence[ScrollTarget], start: int) -> None:
+        headings = [node for _, node in targets if node.type == "heading"]
+        self.slugs.add_headings(headings)
+        self.anchors.add_targets(targets, self.slugs, start=start)
+        self.headings.extend(
+            Heading(
+                level=int(node.tag[1:]),
+                slug=self.slugs.id_for(node),
+                text=node_plaintext(node),
+                classes=frozenset(str(node.attrGet("class") or "").split()),
+            )
+            for node in headings
+        )
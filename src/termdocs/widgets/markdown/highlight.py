@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+lazy syntax-highlighting of code-blocks with a cache of the highlighted lines that is shared by all documents
+"""
+import hashlib
+import typing as t
+import rich.syntax
+import rich.console
+import rich.measure
+from rich.segment import Segment
+from util.constants import SIZE2LANGUAGES
+from util.lru import LRUCache
+
+
+THEME = 'ansi_dark'
+# rough size of a rich.segment.Segment (tuple + style-reference)
+SEGMENT_OVERHEAD = 80
+
+HighlightKey = t.Tuple[str, str, str, int]
+Lines = t.List[t.List[Segment]]
+
+
+class HighlightCache(LRUCache[HighlightKey, Lines]):
+    r"""
+    highlighted lines of code-blocks keyed by (code-hash, lexer, theme, width)
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+
+
+HIGHLIGHT_CACHE = HighlightCache()
+
+
+def estimate_lines_size(lines: Lines) -> int:
+    return sum(SEGMENT_OVERHEAD + len(segment.text) for line in lines for segment in line)
+
+
+class HighlightedCode:
+    r"""
+    renderable for a code-block that only tokenizes the code (with pygments) when it's rendered for the first time
+    for a given width. the number of lines is known without highlighting
+    """
+
+    def __init__(self, code: str, lexer: str, theme: str = THEME):
+        self.code = code
+        self.lexer = lexer
+        self.theme = theme
+        self.digest = hashlib.blake2b(code.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+    @property
+    def line_count(self) -> int:
+        # no word-wrap and no padding
+        return self.code.count('\n') + 1
+
+    def key_for(self, width: int) -> HighlightKey:
+        return self.digest, self.lexer, self.theme, width
+
+    def syntax(self) -> rich.syntax.Syntax:
+        return rich.syntax.Syntax(
+            code=self.code,
+            lexer=self.lexer,
+            theme=self.theme,
+            dedent=True,
+            line_numbers=bool(self.lexer),
+            # code_width=80,
+            tab_size=2 if self.lexer in SIZE2LANGUAGES else 4,
+            word_wrap=False,
+            background_color=None,
+            indent_guides=False,
+            padding=0,
+        )
+
+    def render_lines(self, console: rich.console.Console, options: rich.console.ConsoleOptions) -> Lines:
+        key = self.key_for(options.max_width)
+        lines = HIGHLIGHT_CACHE.get(key)
+        if lines is None:
+            lines = console.render_lines(self.syntax(), options.update(height=None), pad=False)
+            HIGHLIGHT_CACHE.put(key, lines, nbytes=estimate_lines_size(lines))
+        return lines
+
+    def __rich_console__(
+            self, console: rich.console.Console, options: rich.console.ConsoleOptions
+    ) -> rich.console.RenderResult:
+        new_line = Segment.line()
+        for line in self.render_lines(console, options):
+            yield from line
+            yield new_line
+
+    def __rich_measure__(
+            self, console: rich.console.Console, options: rich.console.ConsoleOptions
+    ) -> rich.measure.Measurement:
+        # measuring the syntax doesn't need the tokens
+        return rich.measure.Measurement.get(console, options, self.syntax())
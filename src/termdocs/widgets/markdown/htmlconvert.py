@@ -0,0 +1,411 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+conversion of html in markdown-documents to markdown_it tokens and syntax-trees
+
+the common subset of html in READMEs (<b>, <i>, <a>, <img>, <br>, <kbd>, <sub>, <details>, <p align>, ...)
+is converted directly to tokens while parsing (see html_plugin).
+html-blocks with other markup are left as they are and converted with markdownify when they are rendered
+"""
+import re
+import html
+import html.parser
+import hashlib
+import typing as t
+import markdown_it
+import markdown_it.token
+from markdown_it.rules_core import StateCore
+import markdownify
+from util.lru import LRUCache
+from .nodes import Node
+
+
+Token = markdown_it.token.Token
+
+# inline elements and the token-type (<type>_open / <type>_close) they are converted to
+INLINE_TAGS = {
+    'b': 'strong', 'strong': 'strong',
+    'i': 'em', 'em': 'em',
+    's': 's', 'del': 's', 'strike': 's',
+    'kbd': 'kbd', 'sub': 'sub', 'sup': 'sup',
+}
+# elements that are ignored but whose content is kept
+TRANSPARENT_TAGS = {'span', 'u', 'small', 'big', 'font', 'abbr', 'ins', 'mark', 'picture', 'wbr'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# block elements that can contain other blocks (and can also be opened in one html-block and closed in another)
+CONTAINER_TAGS = {'div': 'div', 'center': 'div', 'details': 'details'}
+
+WHITESPACE_RE = re.compile(r"\s+")
+TAG_RE = re.compile(r"^<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:\s[^>]*?)?)\s*/?>$")
+ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+
+
+class UnsupportedHtml(ValueError):
+    pass
+
+
+def align_class(attrs: t.Dict[str, t.Optional[str]]) -> t.Dict[str, str]:
+    align = (attrs.get('align') or '').lower()
+    return {"class": f"align-{align}"} if align in {'left', 'center', 'right', 'justify'} else {}
+
+
+def image_token(attrs: t.Dict[str, t.Optional[str]]) -> t.Optional[Token]:
+    src = attrs.get('src')
+    if not src:
+        return None
+    alt = attrs.get('alt') or ''
+    return Token(
+        'image', 'img', 0, attrs={"src": src, "alt": ""}, content=alt,
+        children=[Token('text', '', 0, content=alt)],
+    )
+
+
+def parse_tag(markup: str) -> t.Optional[t.Tuple[str, t.Dict[str, t.Optional[str]], bool]]:
+    r"""
+    (tag, attributes, is_closing) of a single html-tag like '<a href="...">' or '</b>'
+    """
+    match = TAG_RE.match(markup.strip())
+    if match is None:
+        return None
+    closing, tag, attributes = match.groups()
+    attrs = {
+        name.lower(): html.unescape(next((value for value in values if value is not None), ''))
+        for name, *values in ATTR_RE.findall(attributes)
+    }
+    return tag.lower(), attrs, bool(closing)
+
+
+class HtmlBlockConverter(html.parser.HTMLParser):
+    r"""
+    converts the supported html-subset to block-level tokens.
+    raises UnsupportedHtml for everything else
+
+    `open_tags` are the container-elements that are still open from a previous html-block.
+    they can be closed by this block and it can leave new ones open
+    """
+
+    def __init__(self, open_tags: t.List[t.Tuple[str, Token]]):
+        super().__init__(convert_charrefs=True)
+        self.open_tags = open_tags
+        self.tokens: t.List[Token] = []
+        # the container-elements opened by this block (in order)
+        self.opened: t.List[Token] = []
+        # the currently open paragraph, heading or summary
+        self._inline_open: t.Optional[Token] = None
+        self._inline: t.Optional[t.List[Token]] = None
+        self._inline_tags: t.List[str] = []
+        self._code: t.Optional[t.List[str]] = None
+
+    def convert(self, markup: str) -> t.List[Token]:
+        self.feed(markup)
+        self.close()
+        self._close_inline()
+        return self.tokens
+
+    def _open_inline(self, token: Token) -> None:
+        self._close_inline()
+        self._inline_open = token
+        self._inline = []
+        self._inline_tags = []
+
+    def _ensure_inline(self) -> t.List[Token]:
+        if self._inline is None:
+            self._open_inline(Token('paragraph_open', 'p', 1, block=True))
+        return self._inline
+
+    def _close_inline(self) -> None:
+        if self._inline is None:
+            return
+        children, opener = self._inline, self._inline_open
+        self._inline = self._inline_open = None
+        while self._inline_tags:
+            children.append(self._inline_close(self._inline_tags.pop()))
+        # whitespace at the start and the end of a block is not rendered
+        texts = [child for child in children if child.type == 'text']
+        if texts:
+            texts[0].content = texts[0].content.lstrip()
+            texts[-1].content = texts[-1].content.rstrip()
+        children = [child for child in children if child.type != 'text' or child.content]
+        if not children and opener.type == 'paragraph_open':
+            return
+        self.tokens.append(opener)
+        self.tokens.append(Token(
+            'inline', '', 0, block=True, children=children,
+            content=''.join(child.content for child in children if child.type == 'text'),
+        ))
+        self.tokens.append(Token(opener.type.replace('_open', '_close'), opener.tag, -1, block=True))
+
+    @staticmethod
+    def _inline_close(tag: str) -> Token:
+        if tag == 'a':
+            return Token('link_close', 'a', -1)
+        return Token(f"{INLINE_TAGS[tag]}_close", tag, -1)
+
+    def handle_starttag(self, tag: str, attrs: t.List[t.Tuple[str, t.Optional[str]]]) -> None:
+        attributes = dict(attrs)
+        if tag in TRANSPARENT_TAGS:
+            return
+        if tag in INLINE_TAGS:
+            self._ensure_inline().append(Token(f"{INLINE_TAGS[tag]}_open", tag, 1))
+            self._inline_tags.append(tag)
+        elif tag == 'a':
+            if attributes.get('href'):
+                self._ensure_inline().append(Token('link_open', 'a', 1, attrs={"href": attributes['href']}))
+                self._inline_tags.append(tag)
+        elif tag == 'img':
+            token = image_token(attributes)
+            if token is not None:
+                self._ensure_inline().append(token)
+        elif tag == 'br':
+            if self._inline is not None:
+                self._inline.append(Token('hardbreak', 'br', 0))
+        elif tag == 'code':
+            self._ensure_inline()
+            self._code = []
+        elif tag == 'p':
+            self._open_inline(Token('paragraph_open', 'p', 1, attrs=align_class(attributes), block=True))
+        elif tag in HEADING_TAGS:
+            heading_attrs = align_class(attributes)
+            if attributes.get('id'):  # links to #id have to keep working (see SlugRegistry)
+                heading_attrs["id"] = attributes['id']
+            self._open_inline(Token('heading_open', tag, 1, attrs=heading_attrs, block=True))
+        elif tag == 'summary':
+            self._open_inline(Token('summary_open', 'summary', 1, block=True))
+        elif tag in CONTAINER_TAGS:
+            self._close_inline()
+            attrs = {"class": "align-center"} if tag == 'center' else align_class(attributes)
+            if tag == 'details' and 'open' in attributes:
+                attrs["open"] = "open"
+            token = Token(f"{CONTAINER_TAGS[tag]}_open", CONTAINER_TAGS[tag], 1, attrs=attrs, block=True)
+            self.tokens.append(token)
+            self.open_tags.append((tag, token))
+            self.opened.append(token)
+        elif tag == 'hr':
+            self._close_inline()
+            self.tokens.append(Token('hr', 'hr', 0, markup='---', block=True))
+        else:
+            raise UnsupportedHtml(tag)
+
+    def handle_startendtag(self, tag: str, attrs: t.List[t.Tuple[str, t.Optional[str]]]) -> None:
+        # <br/> or <img ... />
+        self.handle_starttag(tag, attrs)
+        if tag in INLINE_TAGS or tag in CONTAINER_TAGS or tag == 'a' or tag == 'code':
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in TRANSPARENT_TAGS:
+            return
+        if tag in INLINE_TAGS or tag == 'a':
+            if self._inline is not None and tag in self._inline_tags:
+                while self._inline_tags:
+                    open_tag = self._inline_tags.pop()
+                    self._inline.append(self._inline_close(open_tag))
+                    if open_tag == tag:
+                        break
+        elif tag == 'code':
+            if self._code is not None and self._inline is not None:
+                code = WHITESPACE_RE.sub(' ', ''.join(self._code))
+                self._inline.append(Token('code_inline', 'code', 0, content=code, markup='`'))
+            self._code = None
+        elif tag == 'p' or tag in HEADING_TAGS or tag == 'summary':
+            if self._inline_open is not None and self._inline_open.tag == tag:
+                self._close_inline()
+        elif tag in CONTAINER_TAGS:
+            self._close_inline()
+            if any(open_tag == tag for open_tag, _ in self.open_tags):
+                while self.open_tags:
+                    open_tag, token = self.open_tags.pop()
+                    self.tokens.append(Token(token.type.replace('_open', '_close'), token.tag, -1, block=True))
+                    if open_tag == tag:
+                        break
+        elif tag not in {'br', 'img', 'hr'}:
+            raise UnsupportedHtml(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._code is not None:
+            self._code.append(data)
+            return
+        text = WHITESPACE_RE.sub(' ', data)
+        if self._inline is None and not text.strip():
+            return
+        children = self._ensure_inline()
+        if children and children[-1].type == 'text':
+            children[-1].content += text
+        else:
+            children.append(Token('text', '', 0, content=text))
+
+
+def convert_inline(children: t.List[Token]) -> t.List[Token]:
+    r"""
+    replaces the supported html_inline tokens with the equivalent markdown-tokens.
+    only tags that are opened and closed within the same inline are converted (the tree has to stay balanced)
+    """
+    parsed = [parse_tag(child.content) if child.type == 'html_inline' else None for child in children]
+    closes: t.Dict[int, int] = {}  # index of the opening tag -> index of the closing tag
+    stack: t.List[t.Tuple[str, int]] = []
+    for i, tag_info in enumerate(parsed):
+        if tag_info is None:
+            continue
+        tag, attrs, closing = tag_info
+        if tag not in INLINE_TAGS and not (tag == 'a' and (closing or attrs.get('href'))):
+            continue
+        if not closing:
+            stack.append((tag, i))
+            continue
+        for depth in range(len(stack) - 1, -1, -1):
+            if stack[depth][0] == tag:
+                closes[stack[depth][1]] = i
+                del stack[depth:]
+                break
+
+    converted: t.List[Token] = []
+    close_tokens: t.Dict[int, Token] = {}
+    for i, child in enumerate(children):
+        if i in close_tokens:
+            converted.append(close_tokens.pop(i))
+            continue
+        tag_info = parsed[i]
+        if tag_info is None:
+            converted.append(child)
+            continue
+        tag, attrs, closing = tag_info
+        if i in closes:
+            if tag == 'a':
+                opener = Token('link_open', 'a', 1, attrs={"href": attrs['href']})
+                close_tokens[closes[i]] = Token('link_close', 'a', -1)
+            else:
+                opener = Token(f"{INLINE_TAGS[tag]}_open", tag, 1)
+                close_tokens[closes[i]] = Token(f"{INLINE_TAGS[tag]}_close", tag, -1)
+            converted.append(opener)
+        elif tag == 'br' and not closing:
+            converted.append(Token('hardbreak', 'br', 0))
+        elif tag == 'img' and not closing and image_token(attrs) is not None:
+            converted.append(image_token(attrs))
+        else:
+            converted.append(child)  # unsupported or unbalanced. the tag is not rendered
+    return converted
+
+
+def html_plugin(md: markdown_it.MarkdownIt):
+    md.core.ruler.push(
+        ruleName="html",
+        fn=_html_rule,
+    )
+
+
+def _html_rule(state: StateCore):
+    for token in state.tokens:
+        if token.type == 'inline' and token.children:
+            if any(child.type == 'html_inline' for child in token.children):
+                token.children = convert_inline(token.children)
+    tokens, unclosed = convert_html_blocks(state.tokens)
+    if unclosed:
+        # a container that is never closed would wrap the rest of the document (or of its parent)
+        # into one block. instead it ends with the html-block that opened it
+        tokens, _ = convert_html_blocks(state.tokens, unclosed=unclosed)
+    state.tokens = tokens
+
+
+# (index of the html-block, index of the container opened by it)
+ContainerKey = t.Tuple[int, int]
+
+
+def convert_html_blocks(
+        block_tokens: t.List[Token], unclosed: t.AbstractSet[ContainerKey] = frozenset(),
+) -> t.Tuple[t.List[Token], t.Set[ContainerKey]]:
+    r"""
+    converts the supported html-blocks. containers (<div>, <details>) can span multiple blocks.
+    the containers in `unclosed` are closed at the end of the html-block that opened them.
+    returns the tokens and the containers that had to be closed at the end of their parent (or the document)
+    """
+    tokens: t.List[Token] = []
+    # container-elements that were left open by html-blocks together with the depth they were opened at
+    open_tags: t.List[t.Tuple[str, Token, int]] = []
+    keys: t.Dict[int, ContainerKey] = {}  # id(opener) -> key
+    forced: t.Set[ContainerKey] = set()
+    depth = 0
+
+    def close_open_tags(min_depth: int, line: t.Optional[int]) -> None:
+        while open_tags and open_tags[-1][2] >= min_depth:
+            _, opener, _ = open_tags.pop()
+            forced.add(keys[id(opener)])
+            if opener.map and line is not None:
+                opener.map = [opener.map[0], max(opener.map[1], line)]
+            tokens.append(Token(opener.type.replace('_open', '_close'), opener.tag, -1, block=True))
+
+    last_line = None
+    for index, token in enumerate(block_tokens):
+        if token.map:
+            last_line = token.map[1]
+        if token.type == 'html_block':
+            # only the elements opened in the same container can be closed
+            closable = 0
+            while closable < len(open_tags) and open_tags[len(open_tags) - closable - 1][2] == depth:
+                closable += 1
+            reusable = open_tags[len(open_tags) - closable:]
+            converter = HtmlBlockConverter(open_tags=[(tag, opener) for tag, opener, _ in reusable])
+            try:
+                converted = converter.convert(token.content)
+            except UnsupportedHtml:
+                tokens.append(token)
+                continue
+            for number, opener in enumerate(converter.opened):
+                keys[id(opener)] = (index, number)
+            ending = next(
+                (i for i, (_, opener) in enumerate(converter.open_tags) if keys.get(id(opener)) in unclosed), None,
+            )
+            if ending is not None:
+                # (together with the containers that were opened inside it)
+                for _, opener in reversed(converter.open_tags[ending:]):
+                    converted.append(Token(opener.type.replace('_open', '_close'), opener.tag, -1, block=True))
+                del converter.open_tags[ending:]
+            still_open = [opener for _, opener in converter.open_tags]
+            for _, opener, _ in reusable:
+                if opener not in still_open and opener.map and token.map:
+                    # a container that spans multiple blocks ends here
+                    opener.map = [opener.map[0], max(opener.map[1], token.map[1])]
+            open_tags[len(open_tags) - closable:] = [(tag, opener, depth) for tag, opener in converter.open_tags]
+            for new_token in converted:
+                new_token.map = token.map
+                new_token.level = token.level
+            tokens.extend(converted)
+            continue
+        if token.nesting == -1:
+            close_open_tags(min_depth=depth, line=last_line)
+            depth -= 1
+        elif token.nesting == 1:
+            depth += 1
+        tokens.append(token)
+    close_open_tags(min_depth=0, line=last_line)
+    return tokens, forced
+
+
+class HtmlCache(LRUCache[str, Node]):
+    r"""
+    converted html-fragments keyed by the hash of the html. shared by all documents
+    as the same badges and headers are repeated across many READMEs
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+
+
+HTML_CACHE = HtmlCache()
+
+
+def html_key(markup: str) -> str:
+    return hashlib.blake2b(markup.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+
+def html_to_tree(html: str, parser: markdown_it.MarkdownIt) -> Node:
+    r"""
+    html -> markdown (markdownify) -> syntax-tree. fallback for the html-blocks that html_plugin doesn't support.
+    the returned tree is shared and must not be modified
+    """
+    key = html_key(html)
+    tree = HTML_CACHE.get(key)
+    if tree is None:
+        tokens = parser.parse(src=markdownify.markdownify(html=html))
+        tree = Node.from_tokens(tokens)
+        HTML_CACHE.put(key, tree, nbytes=tree.estimate_size() + len(html))
+    return tree
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+helpers to re-render only the changed top-level blocks of a document
+"""
+import difflib
+import hashlib
+import typing as t
+from .document import SlugRegistry
+from .nodes import Node
+
+
+OpCode = t.Tuple[str, int, int, int, int]
+
+
+def _feed_node(digest: t.Any, node: Node) -> None:
+    digest.update('\0'.join((
+        node.type, node.tag, node.markup, node.info, node.content, str(node.hidden),
+        repr(sorted(node.attrs.items())), repr(node.meta),
+    )).encode('utf-8', errors='surrogatepass'))
+    for child in node.children:
+        _feed_node(digest, child)
+    digest.update(b'\1')  # end of the children
+
+
+def block_key(node: Node, extra: str = "") -> str:
+    r"""
+    identity of a top-level block: the length of its source-range and the hash of its content
+    (the position is not part of the key so that blocks are kept if lines above them change)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(extra.encode())
+    _feed_node(digest, node)
+    span = (node.map[1] - node.map[0]) if node.map else -1
+    return f"{node.type}:{span}:{digest.hexdigest()}"
+
+
+def block_keys(root: Node, slugs: SlugRegistry) -> t.List[str]:
+    # the id of a heading depends on the other headings (de-duplication)
+    keys = [
+        block_key(node, extra=slugs.get(node) or "") if node.type == 'heading' else block_key(node)
+        for node in root.children
+    ]
+    # a table of contents has to be re-rendered if any heading changes
+    headings = ''.join(key for node, key in zip(root.children, keys) if node.type == 'heading')
+    return [
+        block_key(node, extra=headings) if node.type == 'toc' else key
+        for node, key in zip(root.children, keys)
+    ]
+
+
+def diff_blocks(old: t.Sequence[str], new: t.Sequence[str]) -> t.List[OpCode]:
+    return difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+rendering of inline-nodes (text, emphasis, links, ...) into rich.text.Text
+"""
+import logging
+import typing as t
+from rich.text import Text, Span, Style
+import textual.widget
+from . import plugins as markdown_plugins
+from .nodes import Node
+
+
+NULL_STYLE = Style()
+# node-types that only add the style of the component-class with the same name
+STYLED_TYPES = frozenset({'em', 'strong', 's', 'kbd', 'sub', 'sup'})
+# component-classes of the widgets that render inline-nodes
+COMPONENTS = ('code_inline', 'em', 'footnote', 'kbd', 's', 'strong', 'sub', 'sup')
+
+
+class ComponentStyles(t.NamedTuple):
+    r"""
+    what the inline-styles of a widget depend on: its own style (with the inherited colors and background)
+    and the partial styles of its component-classes. widgets with the same ComponentStyles share one InlineRenderer
+    """
+    base: Style
+    partial: t.Tuple[Style, ...]  # in the order of COMPONENTS
+    link_component: t.Optional[str]
+
+    @classmethod
+    def of(cls, widget: textual.widget.Widget, link_component: t.Optional[str] = None) -> 'ComponentStyles':
+        return cls(
+            base=widget.rich_style,
+            # only the partial styles. the full ones have to resolve the background of every ancestor
+            partial=tuple(widget.get_component_styles(name).partial_rich_style for name in COMPONENTS),
+            link_component=link_component,
+        )
+
+
+class TextBuilder:
+    r"""
+    collects text-fragments and merges adjacent fragments with the same style into one span
+    """
+
+    __slots__ = ('_parts', '_spans', '_length')
+
+    def __init__(self):
+        self._parts: t.List[str] = []
+        self._spans: t.List[Span] = []
+        self._length = 0
+
+    def append(self, text: str, style: Style = NULL_STYLE) -> None:
+        if not text:
+            return
+        start = self._length
+        self._parts.append(text)
+        self._length += len(text)
+        if not style:
+            return
+        if self._spans:
+            last = self._spans[-1]
+            # styles are interned. so identity is enough
+            if last.end == start and last.style is style:
+                self._spans[-1] = Span(last.start, self._length, style)
+                return
+        self._spans.append(Span(start, self._length, style))
+
+    def build(self) -> Text:
+        return Text(''.join(self._parts), spans=self._spans)
+
+    def take(self) -> Text:
+        r"""
+        the text so far. the builder starts empty again
+        """
+        text = self.build()
+        self._parts, self._spans, self._length = [], [], 0
+        return text
+
+
+class InlineRenderer:
+    r"""
+    renders inline-nodes with the component-styles of (all widgets with) the same styles of a document.
+    all composed styles (base + component or link-meta) are interned, so they are created only once per document
+    """
+
+    def __init__(self, widget: textual.widget.Widget, styles: ComponentStyles, document_id: str):
+        self.document_id = document_id
+        # the styles are resolved here. the renderer outlives the widget and must not keep it alive
+        self._partial = dict(zip(COMPONENTS, styles.partial))
+        # the non-partial component-styles inherit e.g. the background of the widget
+        self._footnote = widget.get_component_rich_style("footnote")
+        self._link = None if styles.link_component is None else widget.get_component_rich_style(styles.link_component)
+        self._styles: t.Dict[t.Tuple[Style, str, str], Style] = {}
+
+    def _compose(self, base: Style, kind: str, value: str) -> Style:
+        key = (base, kind, value)
+        style = self._styles.get(key)
+        if style is None:
+            if kind == 'component':
+                style = base + self._partial[value]
+            elif kind == 'footnote':
+                style = base + self._footnote + Style.from_meta({"@click": value})
+            elif kind == 'image':
+                style = base + Style.from_meta({"@click": value})
+            else:  # link
+                style = base
+                if self._link is not None:
+                    style += self._link
+                style += Style.from_meta({"@click": value})
+            self._styles[key] = style
+        return style
+
+    def render(
+            self,
+            node: Node,
+            image: t.Optional[t.Callable[[Node], t.Any]] = None,
+    ) -> t.Iterator[t.Union[Text, t.Any]]:
+        r"""
+        yields the rendered text. if `image` is given images are replaced by what it returns (e.g. a widget)
+        which splits the text. otherwise images are rendered as text
+        """
+        builder = TextBuilder()
+        for item in self._render(node, NULL_STYLE, builder, image):
+            yield builder.take()
+            yield item
+        yield builder.take()
+
+    def render_text(self, node: Node) -> Text:
+        builder = TextBuilder()
+        for _ in self._render(node, NULL_STYLE, builder, None):
+            pass
+        return builder.build()
+
+    def _render(self, node, style: Style, builder: TextBuilder, image) -> t.Iterator[t.Any]:
+        for node in node.children:
+            node_type = node.type
+            if node_type == "text":
+                builder.append(node.content, style)
+            elif node_type == "softbreak":
+                builder.append(' ', style)
+            elif node_type == "hardbreak":
+                builder.append('\n')
+            elif node_type in STYLED_TYPES:
+                yield from self._render(node, self._compose(style, 'component', node_type), builder, image)
+            elif node_type == "code_inline":
+                builder.append(node.content, self._compose(style, 'component', node_type))
+            elif node_type == "link":
+                href = node.attrGet('href')
+                yield from self._render(node, self._compose(style, 'link', f"link({href!r})"), builder, image)
+            elif node_type == "image":
+                if image is not None:
+                    yield image(node)
+                    continue
+                src = node.attrGet("src")
+                alt = node.content
+                builder.append(
+                    f"🖼 ({alt})" if alt else "🖼",
+                    self._compose(style, 'image', f"link({src!r})") if src else style,
+                )
+            elif node_type == "emoji":
+                builder.append(markdown_plugins.emoji_for(node.content) or f":{node.content}:", style)
+            elif node_type == "footnote_ref":
+                footnote_id = node.meta['id']
+                action = f"link({f'#footnote-{self.document_id}-{footnote_id}'!r})"
+                builder.append(f"^{footnote_id}", self._compose(style, 'footnote', action))
+            elif node_type == "html_inline":
+                logging.debug(f"Unsupported inline html: {node.content!r}")
+            else:
+                logging.warning(f"Unknown inline node-type: {node_type}")
+                logging.debug(f"{node.describe()}")
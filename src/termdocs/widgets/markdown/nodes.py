@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+compact syntax-tree of a document.
+markdown_it.tree.SyntaxTreeNode keeps the (heavy) tokens alive. Node only copies what the widgets need from them,
+so the token-stream can be dropped once the tree is built
+"""
+import types
+import typing as t
+import markdown_it.token
+
+
+# shared by all nodes without attributes or meta-data (read-only so that no node changes it for all others)
+EMPTY: t.Mapping[str, t.Any] = types.MappingProxyType({})
+# rough size of an empty Node (object + children-list + map-tuple)
+NODE_OVERHEAD = 250
+
+
+class Node:
+    r"""
+    node of the syntax-tree with the same interface (as far as it is used) as markdown_it.tree.SyntaxTreeNode
+    """
+
+    __slots__ = ('type', 'tag', 'attrs', 'content', 'info', 'markup', 'meta', 'map', 'hidden', 'children', 'parent')
+
+    def __init__(
+            self, type_: str, tag: str = "", attrs: t.Mapping[str, t.Any] = EMPTY, content: str = "",
+            info: str = "", markup: str = "", meta: t.Mapping[str, t.Any] = EMPTY,
+            map_: t.Optional[t.Tuple[int, int]] = None, hidden: bool = False, parent: t.Optional['Node'] = None,
+    ):
+        self.type = type_
+        self.tag = tag
+        self.attrs = attrs
+        self.content = content
+        self.info = info
+        self.markup = markup
+        self.meta = meta
+        self.map = map_
+        self.hidden = hidden
+        self.children: t.List[Node] = []
+        self.parent = parent
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.type})"
+
+    @classmethod
+    def from_token(cls, token: markdown_it.token.Token, parent: t.Optional['Node'] = None) -> 'Node':
+        return cls(
+            token.type.removesuffix("_open") if token.nesting == 1 else token.type,
+            tag=token.tag,
+            attrs=token.attrs or EMPTY,
+            content=token.content,
+            info=token.info,
+            markup=token.markup,
+            meta=token.meta or EMPTY,
+            map_=(token.map[0], token.map[1]) if token.map else None,
+            hidden=token.hidden,
+            parent=parent,
+        )
+
+    @classmethod
+    def from_tokens(cls, tokens: t.Iterable[markdown_it.token.Token], root: t.Optional['Node'] = None) -> 'Node':
+        r"""
+        builds the tree of a token-stream (like SyntaxTreeNode(tokens, create_root=True)).
+        if `root` is given the top-level nodes are appended to it
+        """
+        if root is None:
+            root = cls("root")
+        stack = [root]
+        for token in tokens:
+            if token.nesting == -1:
+                if len(stack) == 1:
+                    raise ValueError("Invalid token nesting")
+                stack.pop()
+                continue
+            parent = stack[-1]
+            node = cls.from_token(token, parent=parent)
+            parent.children.append(node)
+            if token.nesting == 1:
+                stack.append(node)
+            elif token.children:  # inline and image
+                cls.from_tokens(token.children, root=node)
+        if len(stack) != 1:
+            raise ValueError(f"unclosed tokens starting {stack[1]!r}")
+        return root
+
+    def describe(self) -> t.Dict[str, t.Any]:
+        r"""
+        the data of the node (for logging. like vars() of a SyntaxTreeNode)
+        """
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ('children', 'parent')}
+
+    def attrGet(self, name: str) -> t.Union[None, str, int, float]:  # noqa: N802 (same name as SyntaxTreeNode)
+        return self.attrs.get(name)
+
+    @property
+    def next_sibling(self) -> t.Optional['Node']:
+        if self.parent is None:
+            return None
+        siblings = self.parent.children
+        index = siblings.index(self) + 1
+        return siblings[index] if index < len(siblings) else None
+
+    def walk(self) -> t.Iterator['Node']:
+        r"""
+        this node and all its descendants (depth-first, in the order of the token-stream)
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def copy(self, parent: t.Optional['Node'] = None) -> 'Node':
+        r"""
+        deep copy with new node-identities (attributes and meta-data are shared)
+        """
+        node = type(self)(
+            self.type, tag=self.tag, attrs=self.attrs, content=self.content, info=self.info, markup=self.markup,
+            meta=self.meta, map_=self.map, hidden=self.hidden, parent=parent,
+        )
+        node.children = [child.copy(parent=node) for child in self.children]
+        return node
+
+    def estimate_size(self) -> int:
+        r"""
+        cheap approximation of the memory used by the (sub-)tree
+        """
+        return sum(NODE_OVERHEAD + len(node.content) for node in self.walk())
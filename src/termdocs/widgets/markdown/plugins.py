@@ -4,6 +4,9 @@ r"""
 
 """
 import re
+import functools
+import typing as t
+from pathlib import Path
 from markdown_it import MarkdownIt
 from markdown_it.rules_block import StateBlock
 from markdown_it.rules_inline import StateInline
@@ -20,29 +23,39 @@ def emoji_plugin(md: MarkdownIt):
     )
 
 
+# source of the emoji-table (which emoji_table() imports lazily). the matched shortcodes depend on it
+EMOJI_TABLE_FILE = Path(__file__).with_name("_emojis.py")
+# syntax of a shortcode like :smile:, :+1: or :sweat_smile:
+__EMOJI_RE = re.compile(r":([a-zA-Z0-9_+\-]+):")
+
+
+@functools.lru_cache(maxsize=1)
+def emoji_table() -> t.Dict[str, str]:
+    r"""
+    shortcode -> emoji. only imported on the first shortcode-like match
+    """
+    from ._emojis import EMOJIS
+    return EMOJIS
+
+
+def emoji_for(name: str) -> t.Optional[str]:
+    return emoji_table().get(name)
+
+
 def _emoji_rule(state: StateInline, silent: bool):
     if state.src[state.pos] != ":":
         return False
-    pos = state.pos + 1
-    emoji_chars = []
-    while pos < state.posMax:
-        char = state.src[pos]
-        pos += 1
-        if char.isalnum():  # maybe change test
-            emoji_chars.append(char)
-        elif char == ":":
-            break
-        else:
-            return False
-    else:
+    match = __EMOJI_RE.match(state.src, state.pos, state.posMax)
+    if match is None:
         return False
-    emoji_name = ''.join(emoji_chars)
-    state.pos += len(emoji_name) + 2
-    token = state.push(ttype="emoji", tag="", nesting=0)
-    token.content = emoji_name
-    # token.attrSet('emoji_name', emoji_name)
-    token.markup = ":"
-
+    emoji_name = match.group(1)
+    if emoji_for(emoji_name) is None:  # e.g. times like 12:30:00
+        return False
+    if not silent:
+        token = state.push(ttype="emoji", tag="", nesting=0)
+        token.content = emoji_name
+        token.markup = ":"
+    state.pos = match.end()
     return True
 
 
@@ -54,7 +67,10 @@ def toc_plugin(md: MarkdownIt):
     )
 
 
-__COMPLEX_TOC_RE = re.compile(r"(?P<style>[-*]|\d+\.) .+\n\{:toc}", re.IGNORECASE)
+# first line of a toc in list-style. the second line has to be '{:toc}'
+__TOC_ITEM_RE = re.compile(r"(?P<style>[-*]|\d+\.) .+")
+__TOC_MARKER = "{:toc}"
+__TOC_FIRST_CHARS = frozenset("[-*0123456789")
 
 
 def _toc_rule(state: StateBlock, startLine: int, endLine: int, silent: bool):
@@ -64,9 +80,13 @@ def _toc_rule(state: StateBlock, startLine: int, endLine: int, silent: bool):
 
     pos = state.bMarks[startLine]
     end = state.eMarks[startLine]
-    content = state.src[pos:end]
+    # this rule runs at the start of every block. so nearly every line is rejected here
+    if pos >= end or state.src[pos] not in __TOC_FIRST_CHARS:
+        return False
 
-    if content.startswith('[[TOC]]'):
+    if state.src.startswith('[[TOC]]', pos, end):
+        if silent:
+            return True
         state.line = startLine + 1
         token = state.push(ttype="toc", tag="", nesting=0)
         token.map = [startLine, state.line]
@@ -74,24 +94,28 @@ def _toc_rule(state: StateBlock, startLine: int, endLine: int, silent: bool):
         token.markup = '[['
         return True
 
+    next_line = startLine + 1
     # also no whitespace offset on the second line
-    if state.tShift[startLine+1] != 0:
+    if next_line >= endLine or state.tShift[next_line] != 0:
+        return False
+    next_pos = state.bMarks[next_line]
+    if (
+            state.eMarks[next_line] - next_pos != len(__TOC_MARKER)
+            or state.src[next_pos:state.eMarks[next_line]].lower() != __TOC_MARKER
+    ):
         return False
 
-    pos = state.bMarks[startLine]
-    maximum = state.eMarks[startLine+1]
-    content = state.src[pos:maximum]
-    match = __COMPLEX_TOC_RE.fullmatch(content)
-
-    if match is not None:
-        state.line = startLine + 2
-        token = state.push(ttype="toc", tag="", nesting=0)
-        token.map = [startLine, state.line]
-        token.attrs["style"] = match.group('style')
-        token.markup = '{:'
+    match = __TOC_ITEM_RE.fullmatch(state.src, pos, end)
+    if match is None:
+        return False
+    if silent:
         return True
-
-    return False
+    state.line = startLine + 2
+    token = state.push(ttype="toc", tag="", nesting=0)
+    token.map = [startLine, state.line]
+    token.attrs["style"] = match.group('style')
+    token.markup = '{:'
+    return True
 
 
 attr_parse = mdit_py_plugins.attrs.parse
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+streaming parse of very large documents.
+the file is memory-mapped and split at safe top-level block-boundaries so that every chunk can be parsed on its own
+"""
+import os
+import re
+import mmap
+import typing as t
+from pathlib import Path
+import markdown_it
+import markdown_it.token
+from markdown_it.common.utils import normalizeReference
+from .backends import ParserBackend, PythonBackend
+
+
+# files with at least this many bytes are streamed (if not explicitly configured)
+STREAM_THRESHOLD = 8 * 1024 * 1024
+# the first chunk is small so that the first screen is shown right away. the following ones grow up to MAX_CHUNK
+FIRST_CHUNK = 16 * 1024
+MAX_CHUNK = 2 * 1024 * 1024
+
+# a blank line followed by a line that can only start a new top-level block (atx-heading or paragraph)
+BOUNDARY_RE = re.compile(rb"\n[ \t]*\r?\n(?=#{1,6}[ \t]|[A-Za-z])")
+# constructs that can contain such lines and have to be closed before a boundary
+STATE_RE = re.compile(
+    rb"^ {0,3}(?P<fence>`{3,}|~{3,})(?P<info>[^\n]*)"
+    rb"|(?P<raw><!--|^ {0,3}<(?:pre|script|style|textarea)\b)"
+    rb"|(?P<raw_end>-->|</(?:pre|script|style|textarea)\s*>)"
+    rb"|^ {0,3}<(?P<open>div|details|center)\b"
+    rb"|</(?P<close>div|details|center)\s*>",
+    re.MULTILINE | re.IGNORECASE,
+)
+FRONT_MATTER_RE = re.compile(rb"---[ \t]*\r?\n.*?\n---[ \t]*(?:\r?\n|$)", re.DOTALL)
+# only the lines that (could) define link-references. see collect_references()
+REFERENCE_RE = re.compile(rb"^ {0,3}\[(?P<label>[^\]\n]+)\]:[^\n]*(?:\n[ \t]+[\"'(][^\n]*)?", re.MULTILINE)
+LABEL_RE = re.compile(rb"\[([^\]\n]+)\]")
+
+
+class BlockScanner:
+    r"""
+    tracks whether a position is inside a fenced code-block, a raw html-block (<pre>, <!-- -->, ...)
+    or an html-container (<div>, <details>) that spans multiple blocks
+    """
+
+    __slots__ = ('fence', 'raw', 'depth')
+
+    def __init__(self):
+        self.fence: t.Optional[bytes] = None
+        self.raw = False
+        self.depth = 0
+
+    @property
+    def is_clean(self) -> bool:
+        return self.fence is None and not self.raw and self.depth <= 0
+
+    def feed(self, data: t.Union[bytes, mmap.mmap], start: int, end: int) -> None:
+        for match in STATE_RE.finditer(data, start, end):
+            if self.fence is not None:
+                fence = match['fence']
+                if fence and fence[0] == self.fence[0] and len(fence) >= len(self.fence) \
+                        and not match['info'].strip():
+                    self.fence = None
+            elif self.raw:
+                if match['raw_end']:
+                    self.raw = False
+            elif match['fence']:
+                self.fence = match['fence']
+            elif match['raw']:
+                self.raw = True
+            elif match['open']:
+                self.depth += 1
+            elif match['close']:
+                self.depth = max(0, self.depth - 1)
+
+
+def split_blocks(
+        data: t.Union[bytes, mmap.mmap], first: int = FIRST_CHUNK, limit: int = MAX_CHUNK,
+) -> t.Iterator[t.Tuple[int, int]]:
+    r"""
+    yields the (start, end) byte-ranges of the chunks. every range ends before a new top-level block
+    """
+    length = len(data)
+    scanner = BlockScanner()
+    start = 0
+    size = first
+    front_matter = FRONT_MATTER_RE.match(data)
+    minimum = front_matter.end() if front_matter else 0
+    while start < length:
+        end = length
+        scanned = start
+        for match in BOUNDARY_RE.finditer(data, max(start + size, minimum)):
+            boundary = match.end()
+            scanner.feed(data, scanned, boundary)
+            scanned = boundary
+            # block-attributes ({: .class }) apply to the following block
+            line_start = data.rfind(b'\n', start, match.start()) + 1
+            if scanner.is_clean and data[line_start:line_start + 1] != b'{':
+                end = boundary
+                break
+        yield start, end
+        start = end
+        size = min(size * 2, limit)
+
+
+def reference_labels(chunk: bytes) -> t.Set[str]:
+    return {normalizeReference(label.decode('utf-8', errors='replace')) for label in LABEL_RE.findall(chunk)}
+
+
+def collect_references(
+        parser: markdown_it.MarkdownIt, data: t.Union[bytes, mmap.mmap], start: int = 0,
+        labels: t.Optional[t.Set[str]] = None,
+) -> t.Dict[str, dict]:
+    r"""
+    link-reference definitions (after `start` and only for `labels` if given).
+    they are often at the end of a document (e.g. changelogs) but are needed by every chunk
+    """
+    env = {}
+    definitions = b'\n\n'.join(
+        match.group() for match in REFERENCE_RE.finditer(data, start)
+        if labels is None or normalizeReference(match['label'].decode('utf-8', errors='replace')) in labels
+    )
+    if definitions:
+        parser.parse(definitions.decode('utf-8', errors='replace'), env)
+    return env.get('references', {})
+
+
+# tokens with the number of a footnote in their meta-data
+FOOTNOTE_TYPES = frozenset({'footnote_ref', 'footnote_open', 'footnote_anchor'})
+
+
+def shift_chunk(tokens: t.List[markdown_it.token.Token], lines: int, footnotes: int) -> None:
+    r"""
+    makes the source-maps and the footnote-ids of a chunk relative to the whole file
+    """
+    for token in tokens:
+        if lines and token.map:
+            token.map = [token.map[0] + lines, token.map[1] + lines]
+        if footnotes and token.type in FOOTNOTE_TYPES:
+            token.meta['id'] += footnotes
+        if token.children:
+            shift_chunk(token.children, lines=0, footnotes=footnotes)
+
+
+def parse_chunks(backend: ParserBackend, file: Path) -> t.Iterator[t.List[markdown_it.token.Token]]:
+    r"""
+    parses the file chunk by chunk. the source-maps of the tokens are relative to the whole file.
+    the footnote-ids continue across the chunks. but a footnote can only be referenced in the chunk that defines it
+    (every chunk gets its own footnote-block)
+    """
+    # the references are collected into the environment that every chunk shares. only the python-parser supports
+    # that. so it's chosen once instead of letting every chunk fall back to it
+    parser = backend.parser
+    python = PythonBackend(parser)
+    with open(file, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return  # an empty file can't be memory-mapped (and has no chunks)
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        line = 0
+        footnotes = 0
+        for index, (start, end) in enumerate(split_blocks(data)):
+            chunk = data[start:end]
+            if index == 0:
+                # collecting all references would delay the first screen. the first chunk only gets the ones
+                # it uses from the end of the file
+                references = collect_references(
+                    parser, data, start=max(end, len(data) - MAX_CHUNK), labels=reference_labels(chunk),
+                )
+            elif index == 1:
+                references = collect_references(parser, data)
+            # footnotes are collected per chunk. only the references are shared
+            env = {'references': references}
+            tokens = python.parse(chunk.decode('utf-8'), env)
+            if line or footnotes:
+                shift_chunk(tokens, lines=line, footnotes=footnotes)
+            line += chunk.count(b'\n')
+            footnotes += len(env.get('footnotes', {}).get('list', ()))
+            yield tokens
@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+the modules of termdocs are imported like __main__.py does (with src/termdocs as the import-root)
+"""
+import sys
+from pathlib import Path
+import pytest
+
+
+SOURCE = Path(__file__).parent.parent / "src" / "termdocs"
+sys.path.insert(0, str(SOURCE))
+# configuration.py (imported by the widgets) parses the command-line. but not the one of pytest
+sys.argv = sys.argv[:1]
+
+
+@pytest.fixture(autouse=True)
+def token_cache(tmp_path, monkeypatch):
+    r"""
+    the parsed token-streams go into a temporary directory instead of the cache of the user
+    """
+    from widgets.markdown import TOKEN_CACHE
+    monkeypatch.setattr(TOKEN_CACHE, 'directory', tmp_path / "tokens")
+    monkeypatch.setattr(TOKEN_CACHE, '_prepared', False)
+    return TOKEN_CACHE
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+conformance between the parser-backends. the compiled backend has to build the same tree as the python-parser
+for every document that it accepts
+"""
+import typing as t
+from pathlib import Path
+import pytest
+import markdown_it.tree
+from widgets.markdown import markdown_parser, parser_backend
+from widgets.markdown.backends import PythonBackend, CompiledBackend, UnsupportedDocument, markdown_it_pyrs
+
+
+ROOT = Path(__file__).parent.parent
+# the documentation and the documents for special cases
+CORPUS = sorted((ROOT / "docs").rglob("*.md")) + sorted((Path(__file__).parent / "conformance").glob("*.md"))
+requires_compiled = pytest.mark.skipif(markdown_it_pyrs is None, reason="markdown-it-pyrs is not installed")
+
+
+def describe(node: markdown_it.tree.SyntaxTreeNode) -> tuple:
+    # what the widgets use of a node. container-content and source-maps are approximations in the compiled backend
+    content = node.content if node.type != 'inline' and not node.children or node.type == 'image' else None
+    return node.type, node.tag, sorted(node.attrs.items()), content, node.info, node.hidden, sorted(node.meta.items())
+
+
+def significant(node: markdown_it.tree.SyntaxTreeNode) -> t.List[markdown_it.tree.SyntaxTreeNode]:
+    # markdown-it-py leaves empty text-tokens behind (e.g. before emphasis at the start of a paragraph)
+    return [child for child in node.children if child.type != 'text' or child.content]
+
+
+def compare_trees(
+        expected: markdown_it.tree.SyntaxTreeNode, actual: markdown_it.tree.SyntaxTreeNode, path: str = "",
+) -> t.Iterator[str]:
+    if expected.type != 'root' and describe(expected) != describe(actual):
+        yield f"{path or '/'}: {describe(expected)} != {describe(actual)}"
+        return
+    expected_children, actual_children = significant(expected), significant(actual)
+    if len(expected_children) != len(actual_children):
+        yield f"{path or '/'}: {len(expected_children)} != {len(actual_children)} children " \
+              f"({[child.type for child in expected_children]} != {[child.type for child in actual_children]})"
+        return
+    for index, (left, right) in enumerate(zip(expected_children, actual_children)):
+        yield from compare_trees(left, right, path=f"{path}/{index}:{left.type}")
+
+
+def differences(markdown: str, tokens: list) -> t.List[str]:
+    expected = markdown_it.tree.SyntaxTreeNode(PythonBackend(markdown_parser).parse(markdown))
+    return list(compare_trees(expected, markdown_it.tree.SyntaxTreeNode(tokens)))[:10]
+
+
+@requires_compiled
+@pytest.mark.parametrize("file", CORPUS, ids=lambda file: str(file.relative_to(ROOT)))
+def test_compiled_backend_conforms(file: Path):
+    markdown = file.read_text(encoding='utf-8')
+    try:
+        tokens = CompiledBackend(markdown_parser).parse(markdown)
+    except UnsupportedDocument as reason:
+        pytest.skip(f"not supported by the compiled backend ({reason})")
+    assert differences(markdown, tokens) == []
+
+
+@pytest.mark.parametrize("file", CORPUS, ids=lambda file: str(file.relative_to(ROOT)))
+def test_configured_backend_builds_the_python_tree(file: Path):
+    # documents with plugin-syntax have to fall back to the python-parser
+    markdown = file.read_text(encoding='utf-8')
+    assert differences(markdown, parser_backend.parse(markdown)) == []
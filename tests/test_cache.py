@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+fingerprint of the persistent token-cache
+"""
+from widgets.markdown import markdown_parser, plugins
+from widgets.markdown.cache import parser_fingerprint
+
+
+def test_fingerprint_follows_the_given_sources(tmp_path):
+    table = tmp_path / "_emojis.py"
+    table.write_text("EMOJIS = {'smile': '😄'}\n", encoding='utf-8')
+    before = parser_fingerprint(markdown_parser, plugins, table)
+    table.write_text("EMOJIS = {'smile': '😄', 'thumbs_up': '👍'}\n", encoding='utf-8')
+    assert parser_fingerprint(markdown_parser, plugins, table) != before
+
+
+def test_emoji_table_is_fingerprinted_by_its_file():
+    assert plugins.EMOJI_TABLE_FILE.is_file()
+    assert parser_fingerprint(markdown_parser, plugins.EMOJI_TABLE_FILE) != parser_fingerprint(markdown_parser)
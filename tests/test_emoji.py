@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+emoji-shortcodes (:smile:)
+"""
+import pytest
+from widgets.markdown import markdown_parser
+
+
+def emojis(markdown: str):
+    inline = markdown_parser.parse(markdown)[1]
+    return [(token.type, token.content) for token in inline.children if token.type == "emoji"]
+
+
+@pytest.mark.parametrize("name", ["smile", "+1", "-1", "thumbsup", "thumbs_up", "thumbs_down"])
+def test_shortcodes(name):
+    assert emojis(f"a :{name}: b") == [("emoji", name)]
+
+
+@pytest.mark.parametrize("text", ["at 12:30:00", "key: value: other", ":not_an_emoji_name:"])
+def test_colons_without_shortcodes(text):
+    assert emojis(text) == []
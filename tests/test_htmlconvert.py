@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+conversion of the common html-subset while parsing (html_plugin)
+"""
+import typing as t
+from widgets.markdown import CustomMarkdown
+
+
+def blocks(markdown: str) -> t.List[t.Tuple[str, t.List[str]]]:
+    root = CustomMarkdown.parse(markdown).root
+    return [(node.type, [child.type for child in node.children]) for node in root.children]
+
+
+def test_inline_html_is_converted():
+    paragraph = CustomMarkdown.parse("Press <kbd>Ctrl</kbd> and <b>bold</b>\n").root.children[0]
+    assert [child.type for child in paragraph.children[0].children] == ['text', 'kbd', 'text', 'strong']
+
+
+def test_container_spans_multiple_blocks():
+    markdown = '<div align="center">\n\n# Title\n\nText\n\n</div>\n\nAfter\n'
+    assert blocks(markdown) == [('div', ['heading', 'paragraph']), ('paragraph', ['inline'])]
+
+
+def test_unclosed_container_ends_with_its_block():
+    markdown = '<div>\n\n# Title\n\nText\n\n## More\n'
+    assert blocks(markdown) == [
+        ('div', []), ('heading', ['inline']), ('paragraph', ['inline']), ('heading', ['inline']),
+    ]
+
+
+def test_unclosed_container_does_not_affect_closed_ones():
+    markdown = '<center>\n\n# A\n\n<details>\n\nText\n\n</details>\n\n# B\n'
+    assert blocks(markdown) == [
+        ('div', []), ('heading', ['inline']), ('details', ['paragraph']), ('heading', ['inline']),
+    ]
+
+
+def test_unclosed_container_in_a_list_item_stays_in_the_item():
+    markdown = '- <div>\n\n  item\n\n- two\n\nafter\n'
+    assert blocks(markdown) == [('bullet_list', ['list_item', 'list_item']), ('paragraph', ['inline'])]
+
+
+def test_unsupported_html_stays_a_html_block():
+    assert blocks('<table>\n<tr><td>x</td></tr>\n</table>\n') == [('html_block', [])]
+
+
+def test_heading_keeps_its_id():
+    document = CustomMarkdown.parse('<h2 id="custom" align="center">Title</h2>\n\n# Title\n')
+    heading = document.root.children[0]
+    assert heading.attrGet("id") == "custom"
+    assert [item.slug for item in document.headings] == ["custom", "title"]
+    assert document.anchors.get("custom") == 0
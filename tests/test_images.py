@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+image-widgets (ColorImage, DetailImage)
+"""
+import time
+import asyncio
+import threading
+import http.server
+import typing as t
+from pathlib import Path
+import numpy as np
+import pytest
+import textual.app
+from textual.geometry import Region
+from PIL import Image
+from widgets import ColorImage
+from widgets._image_base import ImageStore, StoredImage
+from widgets.color_image import HALF_BLOCK, HalfBlockImage, half_block_cells
+from widgets.detail_image import BAYER, FULL, OFFSET, OFFSETMAP, BrailleImage, braille_cells
+
+
+IMAGES = Path(__file__).parent / "images"
+
+
+class ImageApp(textual.app.App):
+    CSS = "ColorImage { width: 40; height: 12; }"
+
+    def __init__(self, widget):
+        super().__init__()
+        self.widget = widget
+
+    def compose(self) -> textual.app.ComposeResult:
+        yield self.widget
+
+
+def test_lines_of_an_update_share_the_rendered_image():
+    calls = []
+
+    class CountingImage(ColorImage):
+        def render_key(self):
+            calls.append(1)
+            return super().render_key()
+
+    async def run():
+        widget = CountingImage(src=IMAGES / "blocks.png")
+        async with ImageApp(widget).run_test() as pilot:
+            for _ in range(50):
+                await pilot.pause(0.05)
+                if widget.image is not None:
+                    break
+            await pilot.pause()
+            calls.clear()
+            widget._styles_cache.clear()
+            return widget.render_lines(Region(0, 0, widget.size.width, widget.size.height))
+
+    strips = asyncio.run(run())
+    assert len(strips) == 12
+    assert len(calls) == 1
+
+
+class ImageServer(http.server.BaseHTTPRequestHandler):
+    r"""
+    serves tests/images/blocks.png with the validators in `validators` and records the requests
+    """
+    validators: t.Dict[str, str] = {}
+    requests: t.List[t.Dict[str, str]] = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        data = (IMAGES / "blocks.png").read_bytes()
+        if ('If-None-Match' in self.headers and self.headers['If-None-Match'] == self.validators.get('ETag')) or \
+                ('If-Modified-Since' in self.headers and self.headers['If-Modified-Since'] == self.validators.get('Last-Modified')):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', "image/png")
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in self.validators.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def image_server():
+    ImageServer.requests = []
+    server = http.server.HTTPServer(('127.0.0.1', 0), ImageServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/image-{time.monotonic_ns()}.png"
+    server.shutdown()
+    server.server_close()
+
+
+def load_twice(url: str) -> t.List[ColorImage]:
+    async def run():
+        widgets = []
+        for _ in range(2):
+            widget = ColorImage(src=url)
+            async with ImageApp(widget).run_test() as pilot:
+                for _ in range(100):
+                    await pilot.pause(0.02)
+                    if widget.image is not None:
+                        break
+            widgets.append(widget)
+        return widgets
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("validators, revalidation", [
+    ({'ETag': '"v1"'}, {'If-None-Match': '"v1"'}),
+    ({'Last-Modified': "Wed, 21 Oct 2015 07:28:00 GMT"}, {'If-Modified-Since': "Wed, 21 Oct 2015 07:28:00 GMT"}),
+])
+def test_web_images_are_revalidated(image_server, validators, revalidation):
+    ImageServer.validators = validators
+    first, second = load_twice(image_server)
+    assert len(ImageServer.requests) == 2
+    for name, value in revalidation.items():
+        assert ImageServer.requests[1][name] == value
+    assert second.image is first.image  # the 304 reuses the stored image
+
+
+def test_web_images_without_validators_are_reused(image_server):
+    ImageServer.validators = {}
+    first, second = load_twice(image_server)
+    assert len(ImageServer.requests) == 1
+    assert second.image is first.image
+
+
+def test_stored_images_are_not_shrunk_again(monkeypatch):
+    shrunk = []
+    thumbnail = Image.Image.thumbnail
+    monkeypatch.setattr(Image.Image, 'thumbnail', lambda image, *args, **kwargs: (
+        shrunk.append(image), thumbnail(image, *args, **kwargs))[-1])
+    widget = ColorImage()
+    widget._show(StoredImage("digest", Image.open(IMAGES / "blocks.png")))
+    assert widget.image is not None and not shrunk
+    widget.image = Image.open(IMAGES / "blocks.png")
+    assert shrunk == [widget.image]
+
+
+def test_too_large_versions_keep_the_stored_one():
+    store = ImageStore(max_bytes=100)
+    image = StoredImage("digest", Image.new("RGB", (1, 1)))
+    store.put(("logo.png", "1"), image, nbytes=10)
+    store.put(("logo.png", "2"), StoredImage("other", Image.new("RGB", (1, 1))), nbytes=1000)
+    assert store.version_of("logo.png") == "1"
+    assert store.get(("logo.png", "1")) is image
+    store.put(("logo.png", "3"), image, nbytes=10)
+    assert len(store) == 1 and store.version_of("logo.png") == "3"
+
+
+def reference_half_blocks(pixels: np.ndarray, background) -> t.List[t.List[t.Tuple[tuple, tuple]]]:
+    r"""
+    (top, bottom) colors of every cell. pixel by pixel
+    """
+    height, width, _ = pixels.shape
+    has_alpha = pixels[..., 3].min() < 255
+
+    def color(y, x):
+        if y >= height:
+            return tuple(background) if has_alpha else (0, 0, 0)
+        *rgb, alpha = (int(v) for v in pixels[y, x])
+        if not has_alpha:
+            return tuple(rgb)
+        return tuple((b * (255 - alpha) + c * alpha) // 255 for b, c in zip(background, rgb))
+
+    return [[(color(y, x), color(y + 1, x)) for x in range(width)] for y in range(0, height, 2)]
+
+
+def unpack(cell: int) -> t.Tuple[tuple, tuple]:
+    return (
+        ((cell >> 40) & 0xFF, (cell >> 32) & 0xFF, (cell >> 24) & 0xFF),
+        ((cell >> 16) & 0xFF, (cell >> 8) & 0xFF, cell & 0xFF),
+    )
+
+
+@pytest.mark.parametrize("shape, alpha", [((6, 5), False), ((7, 3), False), ((5, 4), True)])
+def test_half_block_cells(shape, alpha):
+    rng = np.random.default_rng(sum(shape))
+    pixels = rng.integers(0, 256, (*shape, 4), dtype=np.uint8)
+    if not alpha:
+        pixels[..., 3] = 255
+    background = (12, 34, 56)
+    cells = half_block_cells(pixels, background=background)
+    assert cells.shape == ((shape[0] + 1) // 2, shape[1])
+    assert [[unpack(cell) for cell in row] for row in cells.tolist()] == reference_half_blocks(pixels, background)
+
+
+def test_half_block_rows_merge_equal_cells():
+    pixels = np.zeros((2, 4, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    pixels[:, 2:, 0] = 255
+    image = HalfBlockImage(cells=half_block_cells(pixels, background=(0, 0, 0)), available_width=4)
+    segments = image.render_row(0)
+    assert [segment.text for segment in segments] == [HALF_BLOCK * 2, HALF_BLOCK * 2]
+    assert segments[1].style.bgcolor.triplet == (255, 0, 0)
+
+
+def reference_braille(pixels: np.ndarray, dither: bool) -> t.List[str]:
+    r"""
+    braille-characters of every cell. pixel by pixel
+    """
+    height, width, _ = pixels.shape
+    colors = [[(int(pixels[y, x, 0]) + 1) * int(pixels[y, x, 1]) for x in range(width)] for y in range(height)]
+    boundary = round(sum(map(sum, colors)) / (width * height))
+    invert = boundary < (50 * 255)
+
+    def dot(y, x):
+        color = colors[y][x]
+        if dither:
+            threshold = BAYER[y % 4][x % 4] * FULL
+            return (FULL - color if invert else color) > threshold
+        return color < boundary if invert else color > boundary
+
+    lines = []
+    for cy in range(0, height, 4):
+        line = ""
+        for cx in range(0, width, 2):
+            code = sum(
+                OFFSETMAP[(ox, oy)]
+                for oy in range(4) for ox in range(2)
+                if cy + oy < height and cx + ox < width and dot(cy + oy, cx + ox)
+            )
+            line += chr(OFFSET + code)
+        lines.append(line)
+    return lines
+
+
+@pytest.mark.parametrize("dither", [False, True])
+@pytest.mark.parametrize("shape, light", [((8, 6), 255), ((9, 5), 255), ((8, 4), 60)])
+def test_braille_cells(shape, light, dither):
+    rng = np.random.default_rng(sum(shape))
+    pixels = np.stack([
+        rng.integers(0, light + 1, shape), rng.integers(0, 256, shape),
+    ], axis=-1).astype(np.uint8)
+    rendered = BrailleImage(cells=braille_cells(pixels, dither=dither), available_width=10)
+    lines = [''.join(segment.text for segment in rendered.render_row(y)) for y in range(rendered.height)]
+    assert lines == reference_braille(pixels, dither)
+
+
+def test_dithering_shows_shades():
+    # a flat gray has no edges: only the dithering gives it dots
+    pixels = np.full((8, 8, 2), 128, dtype=np.uint8)
+    pixels[..., 1] = 255
+    assert set(''.join(map(chr, braille_cells(pixels).flatten()))) == {chr(OFFSET)}
+    dots = sum(bin(cell - OFFSET).count('1') for cell in braille_cells(pixels, dither=True).flatten().tolist())
+    assert 0 < dots < 64
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+re-rendering of the changed top-level blocks only (auto-reload)
+"""
+import os
+import asyncio
+import textual.app
+import textual.containers
+from widgets.markdown import CustomMarkdown
+from widgets.markdown.incremental import block_keys, diff_blocks
+
+
+DOCUMENT = """\
+[[TOC]]
+
+# Intro
+
+First paragraph.
+
+Second paragraph.
+
+# Usage
+
+Third paragraph.
+"""
+
+
+def keys(markdown: str):
+    document = CustomMarkdown.parse(markdown)
+    return block_keys(document.root, document.slugs)
+
+
+def changes(old: str, new: str):
+    return [opcode for opcode in diff_blocks(keys(old), keys(new)) if opcode[0] != 'equal']
+
+
+def test_unchanged_document_has_no_changes():
+    assert changes(DOCUMENT, DOCUMENT) == []
+
+
+def test_changed_paragraph_is_replaced():
+    new = DOCUMENT.replace("Second paragraph.", "Second paragraph, changed.")
+    assert changes(DOCUMENT, new) == [('replace', 3, 4, 3, 4)]
+
+
+def test_blocks_below_inserted_lines_are_kept():
+    # the position of a block is not part of its key
+    new = DOCUMENT.replace("First paragraph.\n", "First paragraph.\n\nInserted paragraph.\n")
+    assert changes(DOCUMENT, new) == [('insert', 3, 3, 3, 4)]
+
+
+def test_toc_follows_the_headings():
+    new = DOCUMENT.replace("# Usage", "# Examples")
+    assert changes(DOCUMENT, new) == [('replace', 0, 1, 0, 1), ('replace', 4, 5, 4, 5)]
+
+
+def test_heading_follows_its_deduplicated_id():
+    # the second "# Usage" becomes usage-1. its text and source stay the same
+    old = "# Usage\n\ntext\n\n# Other\n"
+    new = "# Usage\n\ntext\n\n# Usage\n"
+    assert keys(old)[0] == keys(new)[0]
+    assert keys(old)[2] != keys(new)[2]
+
+
+class ReloadApp(textual.app.App):
+    def __init__(self, file):
+        super().__init__()
+        self.file = file
+
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            yield CustomMarkdown(self.file, auto_reload=True)
+
+
+def test_auto_reload_keeps_the_unchanged_widgets(tmp_path):
+    file = tmp_path / "document.md"
+    file.write_text(DOCUMENT, encoding='utf-8')
+
+    async def wait_for(pilot, condition):
+        for _ in range(100):
+            await pilot.pause(0.02)
+            if condition():
+                return
+        raise TimeoutError()
+
+    async def run():
+        async with ReloadApp(file).run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await wait_for(pilot, lambda: len(markdown.children) == 6)
+            before = list(markdown.children)
+            file.write_text(DOCUMENT.replace("Second paragraph.", "Second paragraph, changed."), encoding='utf-8')
+            stat = file.stat()
+            os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            await markdown.check_for_changes()
+            await wait_for(pilot, lambda: markdown.children[3] is not before[3])
+            return before, list(markdown.children)
+
+    before, after = asyncio.run(run())
+    assert len(after) == len(before)
+    assert [a is b for a, b in zip(before, after)] == [True, True, True, False, True, True]
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+rendering of the inline-nodes through the shared InlineRenderer
+"""
+import gc
+import types
+import asyncio
+import typing as t
+import textual.app
+import textual.widget
+import textual.containers
+from rich.color import Color
+from widgets.markdown import CustomMarkdown, MarkdownStatic
+
+
+MARKDOWN = """\
+*plain*
+
+{: .special }
+*special*
+"""
+
+
+class InlineApp(textual.app.App):
+    CSS = ".special .em { color: red; }"
+
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            yield CustomMarkdown()
+
+
+def emphasis_colors(markdown: CustomMarkdown):
+    return [
+        next(span.style.color for span in static.render().spans if span.style.italic)
+        for static in markdown.query(MarkdownStatic)
+    ]
+
+
+def test_component_styles_of_the_widget_are_used():
+    async def run():
+        async with InlineApp().run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await markdown.update(MARKDOWN)
+            await pilot.pause()
+            return emphasis_colors(markdown)
+
+    plain, special = asyncio.run(run())
+    assert plain is None
+    assert special == Color.parse("#ff0000")
+
+
+def reachable(obj, limit: int = 10_000) -> t.Iterator[t.Any]:
+    seen, stack = {id(obj)}, [obj]
+    while stack and len(seen) < limit:
+        for referent in gc.get_referents(stack.pop()):
+            if id(referent) not in seen and not isinstance(referent, (type, types.ModuleType)):
+                seen.add(id(referent))
+                stack.append(referent)
+                yield referent
+
+
+def test_renderers_dont_keep_widgets_alive():
+    async def run():
+        async with InlineApp().run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await markdown.update(MARKDOWN)
+            await pilot.pause()
+            return [
+                type(obj).__name__
+                for renderer in markdown._inline_renderers.values()
+                for obj in reachable(renderer) if isinstance(obj, textual.widget.Widget)
+            ]
+
+    assert asyncio.run(run()) == []
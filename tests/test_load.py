@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+loading of documents in the worker-thread
+"""
+import time
+import asyncio
+import threading
+import textual.app
+import textual.containers
+from widgets.markdown import CustomMarkdown, DOCUMENT_CACHE
+
+
+class LoadApp(textual.app.App):
+    def __init__(self, *files):
+        super().__init__()
+        self.files = files
+
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            for file in self.files:
+                yield CustomMarkdown(file, stream=False)
+
+
+async def wait_for(pilot, condition):
+    for _ in range(100):
+        await pilot.pause(0.02)
+        if condition():
+            return
+    raise TimeoutError()
+
+
+def test_documents_are_read_in_a_worker_thread(tmp_path, monkeypatch):
+    file = tmp_path / "document.md"
+    file.write_text("# Title\n\nSome text.\n", encoding='utf-8')
+    threads = []
+    read = CustomMarkdown.read
+    monkeypatch.setattr(CustomMarkdown, 'read', staticmethod(
+        lambda path: (threads.append(threading.current_thread()), read(path))[-1]
+    ))
+
+    async def run():
+        async with LoadApp(file).run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await wait_for(pilot, lambda: len(markdown.children) == 2)
+            return markdown.document
+
+    document = asyncio.run(run())
+    assert [node.type for node in document.root.children] == ['heading', 'paragraph']
+    assert threads and threading.main_thread() not in threads
+
+
+def test_the_same_file_is_parsed_once(tmp_path):
+    file = tmp_path / "document.md"
+    file.write_text("# Title\n\nSome text.\n", encoding='utf-8')
+
+    async def run():
+        async with LoadApp(file, file).run_test() as pilot:
+            first, second = pilot.app.query(CustomMarkdown)
+            await wait_for(pilot, lambda: first.document is not None and second.document is not None)
+            return first.document, second.document
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert DOCUMENT_CACHE.get(DOCUMENT_CACHE.key_for(file)) is first
+
+
+def test_a_newer_load_replaces_the_older_one(tmp_path):
+    old, new = tmp_path / "old.md", tmp_path / "new.md"
+    old.write_text("# Old\n", encoding='utf-8')
+    new.write_text("# New\n\ntext\n", encoding='utf-8')
+
+    async def run():
+        async with LoadApp().run_test() as pilot:
+            markdown = CustomMarkdown(stream=False)
+            await pilot.app.mount(markdown)
+            await markdown.load(old)
+            await markdown.load(new)
+            await wait_for(pilot, lambda: len(markdown.children) == 2)
+            await pilot.pause(0.1)
+            return markdown
+
+    markdown = asyncio.run(run())
+    assert markdown.file == new
+    assert [node.type for node in markdown.document.root.children] == ['heading', 'paragraph']
+
+
+def test_a_missing_file_is_reported(tmp_path):
+    notifications = []
+
+    async def run():
+        async with LoadApp(tmp_path / "missing.md").run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await wait_for(pilot, lambda: bool(pilot.app._notifications))
+            notifications.extend(pilot.app._notifications)
+            return markdown
+
+    markdown = asyncio.run(run())
+    assert markdown.document is None
+    assert [notification.title for notification in notifications] == ["Failed to load document"]
+
+
+def test_auto_reload_waits_for_the_first_load(tmp_path, monkeypatch):
+    file = tmp_path / "document.md"
+    file.write_text("# Title\n\nSome text.\n", encoding='utf-8')
+    reads = []
+    read = CustomMarkdown.read
+
+    def slow_read(path):
+        reads.append(path)
+        time.sleep(0.3)  # a large document
+        return read(path)
+
+    monkeypatch.setattr(CustomMarkdown, 'read', staticmethod(slow_read))
+    monkeypatch.setattr(CustomMarkdown, 'RELOAD_INTERVAL', 0.02)
+
+    class ReloadApp(textual.app.App):
+        def compose(self) -> textual.app.ComposeResult:
+            with textual.containers.VerticalScroll():
+                yield CustomMarkdown(file, stream=False, auto_reload=True)
+
+    async def run():
+        async with ReloadApp().run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await wait_for(pilot, lambda: len(markdown.children) == 2)
+            await pilot.pause(0.2)
+
+    asyncio.run(run())
+    assert reads == [file]
@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+InternLoggingHandler forwards the log-messages into the app (LoggingConsole)
+"""
+import asyncio
+import logging
+import threading
+import textual.app
+from logging_handler import InternLoggingHandler
+
+
+class LoggingApp(textual.app.App):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def add_log(self, message):
+        self.messages.append(message)
+
+
+def record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("root", logging.DEBUG, __file__, 0, message, None, None)
+
+
+def test_logging_from_a_thread_does_not_wait_for_the_app():
+    async def run():
+        app = LoggingApp()
+        async with app.run_test() as pilot:
+            handler = InternLoggingHandler()
+            handler._app = app
+            thread = threading.Thread(target=handler.handle, args=(record("from a worker"),), daemon=True)
+            thread.start()
+            # the event-loop is blocked while joining. a handler that waits for the app would never return
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+            # the app logs while the worker's message is still pending (the handler-lock has to be free)
+            handler.handle(record("from the app"))
+            await pilot.pause()
+        return app.messages
+
+    assert asyncio.run(run()) == ["from the app", "from a worker"]
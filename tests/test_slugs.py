@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+ids of the headings (SlugRegistry)
+"""
+import asyncio
+import textual.app
+import textual.containers
+from widgets.markdown import CustomMarkdown, MarkdownHeading
+from widgets.markdown.document import SlugRegistry, slugify
+from widgets.markdown.nodes import Node
+
+
+HTML_HEADINGS = """\
+# Foo
+
+<section>
+<h2>Foo</h2>
+</section>
+
+<section>
+<h2>Foo</h2>
+</section>
+"""
+
+
+def heading(text: str, **attrs) -> Node:
+    node = Node("heading", tag="h2", attrs=attrs)
+    inline = Node("inline", parent=node)
+    inline.children.append(Node("text", content=text, parent=inline))
+    node.children.append(inline)
+    return node
+
+
+def test_slugify():
+    assert slugify("Hello World!") == "hello-world"
+    assert slugify("1. Intro") == "_1-intro"
+
+
+def test_duplicates_get_a_counter():
+    registry = SlugRegistry()
+    headings = [heading("Returns"), heading("Returns"), heading("Returns")]
+    registry.add_headings(headings)
+    assert [registry.get(node) for node in headings] == ["returns", "returns-1", "returns-2"]
+
+
+def test_explicit_ids_are_reserved_first():
+    registry = SlugRegistry()
+    headings = [heading("Foo"), heading("Other", id="foo")]
+    registry.add_headings(headings)
+    assert [registry.get(node) for node in headings] == ["foo-1", "foo"]
+
+
+def test_fragment_ids_are_stable():
+    registry = SlugRegistry()
+    registry.add_headings([heading("Foo")])
+    first, second = Node("html_block"), Node("html_block")
+    ids = []
+    for _ in range(3):  # every compose converts the html again (new nodes)
+        nodes = [heading("Foo"), heading("Foo")]
+        registry.add_fragment(first, nodes)
+        other = heading("Foo")
+        registry.add_fragment(second, [other])
+        ids.append(([registry.id_for(node) for node in nodes], registry.id_for(other)))
+    assert ids == [(["foo-1", "foo-2"], "foo-3")] * 3
+    # the nodes of older conversions are not kept
+    assert len(registry) == 4
+
+
+class DocumentApp(textual.app.App):
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            yield CustomMarkdown()
+
+
+def test_html_headings_keep_their_ids_when_recomposed():
+    async def run():
+        app = DocumentApp()
+        async with app.run_test() as pilot:
+            markdown = app.query_one(CustomMarkdown)
+            document = CustomMarkdown.parse(HTML_HEADINGS)
+            ids = []
+            for _ in range(2):  # e.g. a revisit of the (cached) document
+                await markdown.set_document(document)
+                await pilot.pause()
+                ids.append([heading_widget.id for heading_widget in markdown.query(MarkdownHeading)])
+            return ids
+
+    first, second = asyncio.run(run())
+    assert first == ["foo", "foo-1", "foo-2"]
+    assert second == first
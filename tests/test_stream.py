@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+streamed loading of large documents (--stream)
+"""
+import asyncio
+import logging
+import textual.app
+import textual.containers
+from logging_handler import InternLoggingHandler
+from widgets.markdown import CustomMarkdown, parser_backend, stream
+from widgets.markdown.document import ParsedChunk, ParsedDocument
+from widgets.markdown.nodes import Node
+
+
+def large_document(sections: int = 400) -> str:
+    blocks = []
+    for index in range(sections):
+        blocks.append(f"## Section {index}\n\nSome *text* with a [reference][ref-{index % 3}] and `code`.\n")
+        if index % 10 == 0:
+            blocks.append(f"```python\nprint({index})\n```\n")
+    # the definitions at the end are shared by all chunks
+    blocks.extend(f"[ref-{index}]: https://example.com/{index}\n" for index in range(3))
+    return "\n".join(blocks)
+
+
+class StreamApp(textual.app.App):
+    def __init__(self, file):
+        super().__init__()
+        self.file = file
+        self.messages = []
+
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            yield CustomMarkdown(self.file, stream=True)
+
+    def add_log(self, message):
+        self.messages.append(message)
+
+
+def test_parse_chunks_matches_the_whole_document(tmp_path):
+    file = tmp_path / "large.md"
+    file.write_text(large_document(), encoding='utf-8')
+    chunks = list(stream.parse_chunks(parser_backend, file))
+    assert len(chunks) > 1
+
+    streamed = Node("root")
+    for tokens in chunks:
+        Node.from_tokens(tokens, root=streamed)
+    whole = Node.from_tokens(parser_backend.parse(file.read_text(encoding='utf-8')))
+    assert [node.describe() for node in streamed.walk()] == [node.describe() for node in whole.walk()]
+
+
+def test_stream_loads_a_multi_chunk_document_to_completion(tmp_path):
+    file = tmp_path / "large.md"
+    file.write_text(large_document(), encoding='utf-8')
+
+    async def run():
+        app = StreamApp(file)
+        # the log-messages of the worker-thread go into the app (like in __main__.py)
+        handler = InternLoggingHandler()
+        root = logging.getLogger()
+        level = root.level
+        root.addHandler(handler)
+        root.setLevel(logging.DEBUG)
+        try:
+            async with app.run_test() as pilot:
+                markdown = app.query_one(CustomMarkdown)
+                for _ in range(200):
+                    await pilot.pause(0.05)
+                    document = getattr(markdown, 'document', None)
+                    if document is not None and document.complete:
+                        break
+                return markdown.document, app.messages
+        finally:
+            root.removeHandler(handler)
+            root.setLevel(level)
+
+    document, messages = asyncio.run(run())
+    assert document.complete
+    expected = CustomMarkdown.parse(file.read_text(encoding='utf-8'))
+    assert [node.type for node in document.root.children] == [node.type for node in expected.root.children]
+    assert any("Streamed" in message for message in messages)
+
+
+def test_stream_loads_an_empty_document(tmp_path):
+    file = tmp_path / "empty.md"
+    file.write_bytes(b"")
+    assert list(stream.parse_chunks(parser_backend, file)) == []
+
+    async def run():
+        app = StreamApp(file)
+        async with app.run_test() as pilot:
+            markdown = app.query_one(CustomMarkdown)
+            for _ in range(100):
+                await pilot.pause(0.02)
+                document = getattr(markdown, 'document', None)
+                if document is not None and document.complete:
+                    break
+            return markdown.document, list(app._notifications)
+
+    document, notifications = asyncio.run(run())
+    assert document.complete and document.root.children == []
+    assert notifications == []
+
+
+def test_chunks_give_the_ids_of_the_whole_document(tmp_path):
+    file = tmp_path / "large.md"
+    file.write_text(large_document(), encoding='utf-8')
+    streamed = ParsedDocument([], complete=False)
+    for tokens in stream.parse_chunks(parser_backend, file):
+        streamed.extend(ParsedChunk(tokens))
+    whole = CustomMarkdown.parse(file.read_text(encoding='utf-8'))
+    assert all(block.parent is streamed.root for block in streamed.root.children)
+    assert [heading.slug for heading in streamed.headings] == [heading.slug for heading in whole.headings]
+    assert {anchor: streamed.anchors.get(anchor) for anchor in streamed.anchors} == \
+        {anchor: whole.anchors.get(anchor) for anchor in whole.anchors}
+
+
+def test_footnote_ids_continue_across_chunks(tmp_path):
+    file = tmp_path / "footnotes.md"
+    file.write_text("\n".join(
+        f"## Section {index}\n\nText with a note[^{index}].\n\n[^{index}]: Note {index}\n" for index in range(400)
+    ), encoding='utf-8')
+    chunks = list(stream.parse_chunks(parser_backend, file))
+    assert len(chunks) > 1
+    document = ParsedDocument([], complete=False)
+    for tokens in chunks:
+        document.extend(ParsedChunk(tokens))
+    anchors = [node.meta['id'] for node in document.root.walk() if node.type == 'footnote_anchor']
+    references = [node.meta['id'] for node in document.root.walk() if node.type == 'footnote_ref']
+    assert anchors == references == list(range(400))
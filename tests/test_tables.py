@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+# -*- coding=utf-8 -*-
+r"""
+tables as widgets (default) or rendered line by line (--line-tables)
+"""
+import asyncio
+import pytest
+import textual.app
+import textual.containers
+from widgets.markdown import CustomMarkdown, MarkdownLineTable, MarkdownTable
+
+
+TABLE = """\
+| Name | Value |
+|------|------:|
+| a    | 1     |
+| b    | 2     |
+"""
+
+
+class TableApp(textual.app.App):
+    def __init__(self, line_tables: bool):
+        super().__init__()
+        self.line_tables = line_tables
+
+    def compose(self) -> textual.app.ComposeResult:
+        with textual.containers.VerticalScroll():
+            yield CustomMarkdown(line_tables=self.line_tables)
+
+
+@pytest.mark.parametrize("line_tables, table_type", [(False, MarkdownTable), (True, MarkdownLineTable)])
+def test_table_type(line_tables, table_type):
+    async def run():
+        async with TableApp(line_tables).run_test() as pilot:
+            markdown = pilot.app.query_one(CustomMarkdown)
+            await markdown.update(TABLE)
+            await pilot.pause()
+            return [type(child) for child in markdown.children]
+
+    assert asyncio.run(run()) == [table_type]